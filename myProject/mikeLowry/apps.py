@@ -1,6 +1,30 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.db.backends.signals import connection_created
+
+# Per-connection settings. journal_mode is not one of them: it is stored in the database file,
+# so ingest_series switches it to WAL once rather than every connection rewriting db.sqlite3
+SQLITE_PRAGMAS = {
+    'synchronous': 'NORMAL',
+    'temp_store': 'MEMORY',
+    'cache_size': -64000,
+    'mmap_size': 268435456,
+    'busy_timeout': 5000,
+}
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = {**SQLITE_PRAGMAS, **getattr(settings, 'SQLITE_PRAGMAS', {})}
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
 
 
 class MikelowryConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'mikeLowry'
+
+    def ready(self):
+        connection_created.connect(configure_sqlite, dispatch_uid='mikeLowry.configure_sqlite')
@@ -0,0 +1,110 @@
+import asyncio
+import json
+import os
+import threading
+
+from .paper_backend.common.materialize import GENERATIONS_DIR
+from .paper_backend.common.signal_store import SIGNAL_NAMES
+
+QUEUE_SIZE = 16
+
+
+def _clean(value):
+    value = float(value)
+    return None if value != value else value
+
+
+def generation_event(prefix, manifest, series):
+    """What a dashboard needs when prefix publishes: the generation, its last bar and last transition."""
+    event = {'prefix': prefix, 'generation': manifest['generation'], 'created': manifest['created']}
+    if series is not None and len(series.dates):
+        latest = {'date': str(series.dates[-1])}
+        latest.update({key: _clean(values[-1]) for key, values in series.columns.items()})
+        if series.signals is not None:
+            latest['signal'] = SIGNAL_NAMES.get(int(series.signals[-1]))
+        event['latest'] = latest
+        event['transition'] = series.inflection_points[-1] if series.inflection_points else None
+    return event
+
+
+def format_event(event):
+    """One server-sent event frame."""
+    return f"id: {event['prefix']}:{event['generation']}\nevent: generation\ndata: {json.dumps(event)}\n\n"
+
+
+class GenerationWatcher:
+    """
+    Watches the generation manifests the pipeline replaces last when it publishes, and fans one
+    event per new generation out to every subscribed stream. A single task per process stats the
+    manifests, however many dashboards are connected; it stops when the last one leaves.
+    """
+
+    def __init__(self, base_dir, series_cache, interval=1.0):
+        self.base_dir = base_dir
+        self.series_cache = series_cache
+        self.interval = interval
+        self.latest = {}
+        self._stamps = {}
+        self._subscribers = set()
+        self._task = None
+        self._lock = threading.Lock()
+
+    def poll(self):
+        """Blocking scan of the manifests; returns events for generations not seen before."""
+        with self._lock:
+            return self._scan()
+
+    def _scan(self):
+        directory = os.path.join(self.base_dir, GENERATIONS_DIR)
+        try:
+            names = [name for name in os.listdir(directory) if name.endswith('.json')]
+        except FileNotFoundError:
+            return []
+        events = []
+        for name in sorted(names):
+            path = os.path.join(directory, name)
+            try:
+                stamp = os.stat(path).st_mtime_ns
+                if self._stamps.get(path) == stamp:
+                    continue
+                with open(path) as json_file:
+                    manifest = json.load(json_file)
+            except (FileNotFoundError, ValueError):
+                continue
+            self._stamps[path] = stamp
+            prefix = manifest['prefix']
+            if prefix in self.latest and self.latest[prefix]['generation'] == manifest['generation']:
+                continue
+            try:
+                series = self.series_cache.get(prefix)
+            except ValueError:
+                series = None
+            events.append(generation_event(prefix, manifest, series))
+        # Swapped in whole, so a stream subscribing meanwhile never sees half a scan
+        self.latest = {**self.latest, **{event['prefix']: event for event in events}}
+        return events
+
+    async def _run(self):
+        while self._subscribers:
+            for event in await asyncio.to_thread(self.poll):
+                for queue in list(self._subscribers):
+                    if queue.full():
+                        # A stalled client only needs the newest state, so drop its oldest event
+                        queue.get_nowait()
+                    queue.put_nowait(event)
+            await asyncio.sleep(self.interval)
+
+    async def subscribe(self):
+        """A queue of events, primed with the current generation of every prefix."""
+        if not self.latest:
+            await asyncio.to_thread(self.poll)
+        queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        for event in list(self.latest.values())[-QUEUE_SIZE:]:
+            queue.put_nowait(event)
+        self._subscribers.add(queue)
+        if self._task is None or self._task.done() or self._task.get_loop() is not asyncio.get_running_loop():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        return queue
+
+    def unsubscribe(self, queue):
+        self._subscribers.discard(queue)
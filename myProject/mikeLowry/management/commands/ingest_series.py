@@ -0,0 +1,49 @@
+import os
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from ...models import DEFAULT_SYMBOL, INGEST_BATCH_SIZE, Stock
+from ...paper_backend.common.series_store import MANIFEST, SERIES_DIR, Series, series_dir
+from ...paper_backend.common.signal_store import MISSING
+
+
+class Command(BaseCommand):
+    help = ('Loads the series the papers and the master write under data/series into the Stock table. '
+            'Only days from the latest stored date on are upserted unless --full is given.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', help='series to ingest (default: every series on disk)')
+        parser.add_argument('--symbol', default=DEFAULT_SYMBOL, help='symbol the series close belongs to')
+        parser.add_argument('--full', action='store_true', help='upsert the whole history')
+        parser.add_argument('--batch-size', type=int, default=INGEST_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite':
+            # WAL lets the range views read while this writes; the mode persists in the database file
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode = WAL')
+        directory = os.environ.get('PAPERS_SERIES_DIR', SERIES_DIR)
+        names = options['names']
+        if not names and os.path.isdir(directory):
+            names = sorted(name for name in os.listdir(directory) if os.path.exists(os.path.join(directory, name, MANIFEST)))
+        for name in names:
+            try:
+                series = Series.load(series_dir(name, directory))
+            except (FileNotFoundError, ValueError) as e:
+                raise CommandError(f"Cannot load series {name!r}: {e}")
+
+            # The latest stored day is rewritten too, in case that bar was revised since
+            lo = 0
+            latest = None if options['full'] else Stock.objects.latest_date(name, options['symbol'])
+            if latest is not None:
+                lo = int(np.searchsorted(series.dates, np.datetime64(latest, 'D'), side='left'))
+            signals = series.signals if series.signals is not None else np.full(len(series.dates), MISSING, dtype=np.int8)
+            buy_percentage = series.columns.get('buy_percentage')
+            count = Stock.objects.upsert(
+                name, np.asarray(series.dates[lo:]), np.asarray(series.columns['close'][lo:]), np.asarray(signals[lo:]),
+                None if buy_percentage is None else np.asarray(buy_percentage[lo:]),
+                symbol=options['symbol'], batch_size=options['batch_size'],
+            )
+            self.stdout.write(f"{name}: {count} rows upserted")
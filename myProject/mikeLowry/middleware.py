@@ -0,0 +1,35 @@
+import time
+
+from asgiref.sync import iscoroutinefunction
+from django.utils.decorators import sync_and_async_middleware
+
+from .paper_backend.common.instrument import observe
+
+
+def _record(request, response, started):
+    # Labelled by route name rather than path, so unrouted URLs cannot grow the label set
+    match = getattr(request, 'resolver_match', None)
+    view = match.view_name if match is not None else 'unresolved'
+    observe('http_request_seconds', time.perf_counter() - started,
+            view=view, method=request.method, status=response.status_code)
+
+
+@sync_and_async_middleware
+def view_latency_middleware(get_response):
+    """
+    Records every response's latency in a histogram per view, method and status. For streamed
+    responses such as the event stream this is the time until the headers are sent.
+    """
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            started = time.perf_counter()
+            response = await get_response(request)
+            _record(request, response, started)
+            return response
+    else:
+        def middleware(request):
+            started = time.perf_counter()
+            response = get_response(request)
+            _record(request, response, started)
+            return response
+    return middleware
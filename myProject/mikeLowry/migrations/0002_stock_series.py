@@ -0,0 +1,40 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mikeLowry', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stock',
+            name='strategy',
+            field=models.CharField(default='', max_length=32),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='stock',
+            name='symbol',
+            field=models.CharField(default='SPY', max_length=16),
+        ),
+        migrations.AddField(
+            model_name='stock',
+            name='buy_percentage',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='stock',
+            name='signal',
+            field=models.CharField(blank=True, max_length=4),
+        ),
+        migrations.AddConstraint(
+            model_name='stock',
+            constraint=models.UniqueConstraint(fields=('strategy', 'symbol', 'date'), name='stock_strategy_symbol_date'),
+        ),
+        migrations.AddIndex(
+            model_name='stock',
+            index=models.Index(fields=['symbol', 'date'], name='stock_symbol_date'),
+        ),
+    ]
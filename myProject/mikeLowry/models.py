@@ -1,9 +1,95 @@
-from django.db import models
+import numpy as np
+from django.db import models, transaction
+
+from .paper_backend.common.series_store import Series
+from .paper_backend.common.signal_store import MISSING, SIGNAL_CODES, SIGNAL_NAMES
+from .paper_backend.common.transitions import find_transitions
+
+DEFAULT_SYMBOL = 'SPY'
+INGEST_BATCH_SIZE = 5000
+
+
+class StockQuerySet(models.QuerySet):
+    """Range queries and bulk upserts over one (strategy, symbol) series at a time."""
+
+    def series(self, strategy, symbol=DEFAULT_SYMBOL):
+        return self.filter(strategy=strategy, symbol=symbol)
+
+    def between(self, strategy, start=None, end=None, symbol=DEFAULT_SYMBOL):
+        """Rows dated within [start, end] in date order: one range scan of the unique index."""
+        rows = self.series(strategy, symbol)
+        if start is not None:
+            rows = rows.filter(date__gte=start)
+        if end is not None:
+            rows = rows.filter(date__lte=end)
+        return rows.order_by('date')
+
+    def latest_date(self, strategy, symbol=DEFAULT_SYMBOL):
+        return self.series(strategy, symbol).order_by('-date').values_list('date', flat=True).first()
+
+    def window(self, strategy, start=None, end=None, symbol=DEFAULT_SYMBOL):
+        """
+        The rows within [start, end] as a Series, so the range view slices and downsamples it
+        like a series file. Inflection points count a change against the row before start.
+        """
+        rows = list(self.between(strategy, start, end, symbol)
+                    .values_list('date', 'closing_price', 'buy_percentage', 'signal'))
+        previous = None
+        if start is not None:
+            previous = (self.series(strategy, symbol).filter(date__lt=start).order_by('-date')
+                        .values_list('signal', flat=True).first())
+        dates = np.array([row[0] for row in rows], dtype='datetime64[D]')
+        columns = {'close': np.array([row[1] for row in rows], dtype='float64')}
+        buy_percentage = np.array([np.nan if row[2] is None else row[2] for row in rows], dtype='float64')
+        if not np.isnan(buy_percentage).all():
+            columns['buy_percentage'] = buy_percentage
+        codes = np.array([SIGNAL_CODES.get(row[3], MISSING) for row in rows], dtype=np.int8)
+
+        # Changes between signalled days; the row before start only decides the first one
+        signalled = np.flatnonzero(codes != MISSING)
+        head = [SIGNAL_CODES[previous]] if previous in SIGNAL_CODES else []
+        transitions = find_transitions(None, np.concatenate([head, codes[signalled]]).astype(np.int8))
+        changed = signalled[transitions.indices - len(head)]
+        inflection_points = [{'date': str(dates[i]), 'signal': SIGNAL_NAMES[int(codes[i])]} for i in changed]
+        return Series(dates, columns, inflection_points, codes)
+
+    def upsert(self, strategy, dates, closes, signals, buy_percentages=None, symbol=DEFAULT_SYMBOL,
+               batch_size=INGEST_BATCH_SIZE):
+        """
+        Inserts or updates one row per date in batched INSERT ... ON CONFLICT statements inside a
+        single transaction. signals holds int8 codes (MISSING for no signal). Returns the row count.
+        """
+        rows = [
+            Stock(strategy=strategy, symbol=symbol, date=date, closing_price=float(close),
+                  signal=SIGNAL_NAMES.get(int(code), ''),
+                  buy_percentage=None if buy_percentages is None or np.isnan(buy_percentages[i]) else float(buy_percentages[i]))
+            for i, (date, close, code) in enumerate(zip(dates.tolist(), closes, signals))
+            if not np.isnan(close)
+        ]
+        with transaction.atomic():
+            self.bulk_create(rows, batch_size=batch_size, update_conflicts=True,
+                             unique_fields=['strategy', 'symbol', 'date'],
+                             update_fields=['closing_price', 'signal', 'buy_percentage'])
+        return len(rows)
+
 
 class Stock(models.Model):
+    strategy = models.CharField(max_length=32)  # series name, e.g. '2014' or 'master'
+    symbol = models.CharField(max_length=16, default=DEFAULT_SYMBOL)
     date = models.DateField()
     closing_price = models.FloatField()
-    signal = models.CharField(max_length=4)  # 'buy' or 'sell'
+    signal = models.CharField(max_length=4, blank=True)  # 'Buy', 'Sell' or '' when there is none
+    buy_percentage = models.FloatField(null=True, blank=True)  # only the master series has one
+
+    objects = StockQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['strategy', 'symbol', 'date'], name='stock_strategy_symbol_date'),
+        ]
+        indexes = [
+            models.Index(fields=['symbol', 'date'], name='stock_symbol_date'),
+        ]
 
     def __str__(self):
-        return f"{self.date} - {self.closing_price} - {self.signal}"
+        return f"{self.strategy} {self.symbol} {self.date} - {self.closing_price} - {self.signal}"
@@ -41,12 +41,10 @@ def plot_spy_data(df):
     plt.plot(df['Date'], df['50-SMA'], label='50-Day SMA', color='green')
     plt.plot(df['Date'], df['200-SMA'], label='200-Day SMA', color='blue')
 
-    # Add signals
-    for _, row in df.iterrows():
-        if row['Signal'] == 'Confirmed 5% Canary Signal':
-            plt.scatter(row['Date'], row['Close'], color='red', label='Confirmed 5% Canary Signal', s=100)
-        elif row['Signal'] == 'Buy the Dip Signal':
-            plt.scatter(row['Date'], row['Close'], color='green', label='Buy the Dip Signal', s=100)
+    # Add signals, one batched scatter per signal type
+    for signal, color in [('Confirmed 5% Canary Signal', 'red'), ('Buy the Dip Signal', 'green')]:
+        rows = df[df['Signal'] == signal]
+        plt.scatter(rows['Date'], rows['Close'], color=color, label=signal, s=100)
 
     # Avoid duplicate labels in legend
     handles, labels = plt.gca().get_legend_handles_labels()
@@ -0,0 +1,157 @@
+"""
+Performance analytics for every signal series.
+
+Each strategy, the majority consensus and SPY itself become one row of a (series x trading days)
+position matrix on SPY's calendar: a day holds SPY when the series' latest signal is Buy, and is
+flat on Sell. Series count only between their first and last signal. Every metric is then a
+row-wise reduction over a timeframe's columns, so one pass covers all series. return_metrics
+is the shared kernel; common/sweep.py scores grid points with it too.
+"""
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from .atomic import atomic_write
+from .consensus import ConsensusMatrix
+from .materialize import TIMEFRAMES, Materializer
+from .signal_store import BUY, MISSING
+
+ANALYTICS_FILE = 'analytics.json'
+TRADING_DAYS = 252
+CONSENSUS = 'consensus'
+BENCHMARK = 'SPY'
+METRICS = ['days', 'total_return', 'cagr', 'volatility', 'sharpe', 'max_drawdown', 'hit_rate', 'exposure', 'turnover']
+
+
+def _forward_fill(codes):
+    """Carries each row's latest code over MISSING entries; entries before a row's first code stay MISSING."""
+    valid = codes != MISSING
+    latest = np.where(valid, np.arange(codes.shape[1]), 0)
+    np.maximum.accumulate(latest, axis=1, out=latest)
+    return np.where(np.maximum.accumulate(valid, axis=1), np.take_along_axis(codes, latest, axis=1), MISSING)
+
+
+def position_matrix(consensus, market_dates, weights=None):
+    """
+    (names, codes) with one row per strategy, then the consensus and the SPY benchmark, and one
+    int8 column per market date. Codes are BUY/SELL, or MISSING outside a series' signal span.
+    """
+    names = [*consensus.names, CONSENSUS, BENCHMARK]
+    benchmark = np.full((1, len(market_dates)), BUY, dtype=np.int8)
+    if len(consensus.dates) == 0:
+        return names, np.vstack([np.full((len(names) - 1, len(market_dates)), MISSING, dtype=np.int8), benchmark])
+    majority = consensus.majority_codes(weights)
+    _, reporting = consensus.counts()
+    codes = np.vstack([consensus.codes, np.where(reporting > 0, majority, MISSING)]).astype(np.int8)
+
+    # Latest signal on or before each market date, limited to each row's first..last signal date
+    filled = _forward_fill(codes)
+    columns = np.searchsorted(consensus.dates, market_dates, side='right') - 1
+    positions = np.where(columns >= 0, filled[:, np.maximum(columns, 0)], MISSING)
+    valid = codes != MISSING
+    has_signal = valid.any(axis=1)
+    first = consensus.dates[np.argmax(valid, axis=1)]
+    last = consensus.dates[codes.shape[1] - 1 - np.argmax(valid[:, ::-1], axis=1)]
+    in_span = (market_dates >= first[:, None]) & (market_dates <= last[:, None]) & has_signal[:, None]
+    positions = np.where(in_span, positions, MISSING)
+    return names, np.vstack([positions, benchmark]).astype(np.int8)
+
+
+def return_metrics(returns, active):
+    """
+    Return and risk metrics of every row of a (series x days) matrix of daily strategy returns,
+    counting only the days where active is True. Returns {metric: float array with one value
+    per row}; NaN where a row has no active day.
+    """
+    returns = np.where(active, returns, np.nan)
+    days = active.sum(axis=1)
+    equity = np.cumprod(np.where(active, 1 + np.nan_to_num(returns), 1.0), axis=1)
+    if equity.shape[1] == 0:
+        equity = np.ones((len(returns), 1))
+    peak = np.maximum(np.maximum.accumulate(equity, axis=1), 1.0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        years = days / TRADING_DAYS
+        final = np.where(days > 0, equity[:, -1], np.nan)
+        mean = np.nansum(returns, axis=1) / days
+        volatility = np.sqrt(np.nansum((returns - mean[:, None]) ** 2, axis=1) / days) * np.sqrt(TRADING_DAYS)
+        return {
+            'days': days.astype(float),
+            'total_return': final - 1,
+            # A wiped-out equity curve has no real root; count it as a total loss
+            'cagr': np.where(final > 0, final ** (1 / years) - 1, np.where(days > 0, -1.0, np.nan)),
+            'volatility': volatility,
+            'sharpe': np.where(volatility > 0, mean * TRADING_DAYS / volatility, np.nan),
+            'max_drawdown': np.where(days > 0, (equity / peak - 1).min(axis=1), np.nan),
+        }
+
+
+def window_metrics(positions, next_returns):
+    """
+    Metrics of every row for one window. positions is (series x days) and next_returns[t] the
+    market return from day t to day t + 1, so the last day's position earns nothing.
+    Returns {metric: float array with one value per row}; NaN where a row has no active day.
+    """
+    held = positions[:, :-1]
+    active = held != MISSING
+    buys = held == BUY
+    metrics = return_metrics(buys * next_returns[:-1], active)
+
+    days = active.sum(axis=1)
+    up = next_returns[:-1] > 0
+    down = next_returns[:-1] < 0
+    hits = (active & ((buys & up) | (~buys & down))).sum(axis=1)
+    changes = (active[:, 1:] & active[:, :-1] & (held[:, 1:] != held[:, :-1])).sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        metrics.update(
+            hit_rate=hits / days,
+            exposure=(active & buys).sum(axis=1) / days,
+            turnover=changes / (days / TRADING_DAYS),
+        )
+    return metrics
+
+
+def _clean(value):
+    # NaN and inf are not valid JSON
+    return round(float(value), 6) if np.isfinite(value) else None
+
+
+def performance_report(signals_by_strategy, spy_close, weights=None, timeframes=TIMEFRAMES, now=None):
+    """
+    Metrics of every strategy, the consensus and SPY over the full history and each timeframe,
+    as a JSON-ready dict: {'timeframes': {label: {'start', 'end', 'metrics': {name: {...}}}}}.
+    spy_close is SPY's close Series; weights weigh the consensus as in build_master.
+    """
+    now = now or datetime.now()
+    spy_close = spy_close.sort_index()
+    market_index = pd.DatetimeIndex(spy_close.index).normalize()
+    market_dates = market_index.values.astype('datetime64[D]')
+    close = spy_close.to_numpy(dtype='float64')
+    next_returns = np.append(close[1:] / close[:-1] - 1, 0.0)
+
+    consensus = ConsensusMatrix.from_signals(signals_by_strategy)
+    names, positions = position_matrix(consensus, market_dates, weights)
+
+    windows = {'All': (market_index[0].date() if len(market_index) else None, pd.Timestamp(now).date(),
+                       0, len(market_dates))}
+    windows.update(Materializer(BENCHMARK, None, timeframes=timeframes, now=now).windows(market_index))
+    report = {'generated': pd.Timestamp(now).isoformat(), 'series': names, 'metrics': METRICS, 'timeframes': {}}
+    for label, (start, end, lo, hi) in windows.items():
+        values = window_metrics(positions[:, lo:hi], next_returns[lo:hi])
+        report['timeframes'][label] = {
+            'start': start.isoformat() if start else None,
+            'end': end.isoformat(),
+            'metrics': {name: {metric: _clean(values[metric][row]) for metric in METRICS}
+                        for row, name in enumerate(names)},
+        }
+    return report
+
+
+def write_report(report, base_dir):
+    """Writes the report to <base_dir>/analytics.json through a rename; returns the path."""
+    path = os.path.join(base_dir, ANALYTICS_FILE)
+    atomic_write(path, json.dumps(report, indent=4))
+    return path
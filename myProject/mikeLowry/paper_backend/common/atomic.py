@@ -0,0 +1,32 @@
+"""
+Atomic file replacement.
+
+Every writer gets its own temp file next to the target, so overlapping runs never rename each
+other's half-written file into place; the last complete write wins.
+"""
+import os
+import tempfile
+from contextlib import contextmanager
+
+
+@contextmanager
+def atomic_open(path, mode='w'):
+    """Yields a per-writer temp file next to path and renames it over path if the block succeeds."""
+    directory, name = os.path.split(os.path.abspath(path))
+    handle = tempfile.NamedTemporaryFile(mode, dir=directory, prefix=f'{name}.', suffix='.tmp', delete=False)
+    try:
+        with handle:
+            yield handle
+        # NamedTemporaryFile creates 0600 files; published files keep the usual mode
+        os.chmod(handle.name, 0o644)
+        os.replace(handle.name, path)
+    except BaseException:
+        if os.path.exists(handle.name):
+            os.remove(handle.name)
+        raise
+
+
+def atomic_write(path, data):
+    """Writes text or bytes to path through a per-writer temp file and a rename."""
+    with atomic_open(path, 'wb' if isinstance(data, bytes) else 'w') as handle:
+        handle.write(data)
@@ -0,0 +1,131 @@
+"""
+Vectorized portfolio backtester.
+
+Works on (dates x tickers) price and target-weight matrices instead of per-bar callbacks. Orders
+follow order_target_percent on backtrader's default broker: on a rebalance bar each ticker trades
+the whole shares of the gap between its target value and its held value at that bar's close (a
+zero target closes the position), in ticker order, and fills at the next bar's open. As the broker
+does, the orders are first checked against the running cash at the close prices, and a buy the
+cash left at the open cannot cover is rejected. Only rebalance bars are visited one by one,
+everything between them is array arithmetic.
+"""
+import numpy as np
+import pandas as pd
+
+TRADE_COLUMNS = ['date', 'ticker', 'size', 'price', 'value', 'commission']
+
+
+class BacktestResult:
+    """
+    equity and cash per bar, positions (shares) per bar, the trade log, rejected orders and the
+    turnover of every fill bar (traded value over the portfolio value at that open).
+    """
+
+    def __init__(self, equity, cash, positions, trades, rejected, turnover, start_cash):
+        self.equity = equity
+        self.cash = cash
+        self.positions = positions
+        self.trades = trades
+        self.rejected = rejected
+        self.turnover = turnover
+        self.start_cash = start_cash
+
+    def summary(self):
+        final_value = float(self.equity.iloc[-1]) if len(self.equity) else self.start_cash
+        years = max((self.equity.index[-1] - self.equity.index[0]).days / 365.25, 1e-9) if len(self.equity) > 1 else 0
+        return {
+            'final_value': final_value,
+            'final_cash': float(self.cash.iloc[-1]) if len(self.cash) else self.start_cash,
+            'total_return': final_value / self.start_cash - 1,
+            'trades': len(self.trades),
+            'rejected_orders': len(self.rejected),
+            'annual_turnover': float(self.turnover.sum() / years) if years else 0.0,
+        }
+
+
+def rebalance_mask(n_bars, period, offset=0):
+    """True on every period-th bar from offset on, like a counter checked with counter % period == 0."""
+    mask = np.zeros(n_bars, dtype=bool)
+    mask[offset::period] = True
+    return mask
+
+
+def run_backtest(opens, closes, weights, rebalance, cash=1000000.0, commission=0.0):
+    """
+    Backtests target weights. opens and closes are (dates x tickers) DataFrames, weights has
+    the same shape (NaN counts as 0) and is read on the rows where rebalance is True.
+    commission is a fraction of traded value. Returns a BacktestResult.
+    """
+    dates = closes.index
+    tickers = list(closes.columns)
+    open_prices = opens.reindex(index=dates, columns=tickers).to_numpy(dtype='float64')
+    close_prices = closes.to_numpy(dtype='float64')
+    # Positions are valued at the last known close while a ticker has no bar
+    marks = closes.ffill().fillna(0.0).to_numpy(dtype='float64')
+    targets = np.nan_to_num(weights.reindex(index=dates, columns=tickers).to_numpy(dtype='float64'))
+    n_bars, n_tickers = close_prices.shape
+
+    position_changes = np.zeros((n_bars, n_tickers))
+    cash_flows = np.zeros(n_bars)
+    turnover = {}
+    trades = []
+    rejected = []
+
+    shares = np.zeros(n_tickers)
+    available = float(cash)
+    for row in np.flatnonzero(np.asarray(rebalance, dtype=bool)[:n_bars]):
+        fill_row = row + 1
+        if fill_row >= n_bars:
+            break
+        # Size at the decision bar's close, against the portfolio value at that close
+        value = available + shares @ marks[row]
+        price = close_prices[row]
+        tradable = (price > 0) & ~np.isnan(open_prices[fill_row])
+        safe_price = np.where(tradable, price, 1.0)
+        target_value = value * targets[row]
+        held_value = shares * safe_price
+        size = np.floor_divide(np.abs(target_value - held_value), safe_price)
+        delta = np.where(target_value > held_value, size, -size)
+        delta = np.where((target_value == 0) & (shares != 0), -shares, delta)
+        orders = np.flatnonzero(tradable & (delta != 0))
+        if not len(orders):
+            continue
+
+        # The broker pseudo-executes the submitted orders at their close; one that leaves the
+        # running cash negative is rejected, and its cost stays in the running total
+        running = available - np.cumsum(delta[orders] * price[orders] * (1 + commission * np.sign(delta[orders])))
+        for column in orders[running < 0]:
+            rejected.append((dates[fill_row], tickers[column], delta[column], price[column]))
+
+        fill_price = open_prices[fill_row]
+        previous_shares = shares.copy()
+        previous_cash = available
+        value_at_open = available + shares @ np.where(np.isnan(fill_price), marks[row], fill_price)
+        traded_value = 0.0
+        for column in orders[running >= 0]:
+            cost = delta[column] * fill_price[column]
+            fee = abs(cost) * commission
+            if cost + fee > available:
+                rejected.append((dates[fill_row], tickers[column], delta[column], fill_price[column]))
+                continue
+            available -= cost + fee
+            shares[column] += delta[column]
+            traded_value += abs(cost)
+            trades.append((dates[fill_row], tickers[column], delta[column], fill_price[column], cost, fee))
+
+        position_changes[fill_row] = shares - previous_shares
+        cash_flows[fill_row] = available - previous_cash
+        turnover[dates[fill_row]] = traded_value / value_at_open if value_at_open > 0 else 0.0
+
+    positions = np.cumsum(position_changes, axis=0)
+    cash_curve = cash + np.cumsum(cash_flows)
+    equity = cash_curve + (positions * marks).sum(axis=1)
+    return BacktestResult(
+        equity=pd.Series(equity, index=dates, name='Equity'),
+        cash=pd.Series(cash_curve, index=dates, name='Cash'),
+        positions=pd.DataFrame(positions, index=dates, columns=tickers),
+        trades=pd.DataFrame(trades, columns=TRADE_COLUMNS),
+        rejected=pd.DataFrame(rejected, columns=['date', 'ticker', 'size', 'price']),
+        turnover=pd.Series(turnover, dtype='float64', name='Turnover'),
+        start_cash=float(cash),
+    )
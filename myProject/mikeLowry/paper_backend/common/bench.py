@@ -0,0 +1,197 @@
+"""
+Benchmarks of the pipeline's hot paths on synthetic markets.
+
+For every universe size a seeded SyntheticMarket is generated and each case is timed `repeat`
+times: the papers' signal computations, the quantamentals factor panel and vectorized backtest,
+the consensus and inflection points, the analytics, the plotly writers, the chart renders and
+the streaming replay. Every result is appended as one JSON line to the history file together
+with the commit and library versions, and compared with the previous entry of the same case
+and size. Run from paper_backend with
+`python -m common.bench [--sizes 1,100,1000,5000] [--years 40]`. 5,000 tickers x 40 years needs
+a couple of GB of memory.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from .analytics import performance_report
+from .charts import render_master_charts
+from .factors import FactorPanel
+from .master import build_master, publish_master
+from .materialize import Materializer
+from .stream import StreamEngine
+from .strategy import REGISTRY, load_papers
+from .synthetic import MARKET_TICKERS, SyntheticMarket
+from .transitions import transitions_from_signals
+
+HISTORY_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'benchmarks', 'history.jsonl'))
+DEFAULT_SIZES = [1, 100, 1000, 5000]
+PAPERS = ['2014_utilities', '2016_leverage', '2023_canary', '2024_lows']
+# 2020_quantamentals screens the S&P 500, so it is fed at most this many universe tickers
+QUANTAMENTALS_TICKERS = 500
+
+
+def timed(func, repeat):
+    """Runs func repeat times; returns (last result, list of seconds)."""
+    seconds = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        seconds.append(time.perf_counter() - started)
+    return result, seconds
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(__file__), timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _replay(bars):
+    # The daily states over the market tickers, bar by bar as a feed would deliver them
+    engine = StreamEngine.from_names(['2014_utilities', '2016_leverage', '2023_canary'])
+    frame = pd.concat({ticker: bars[ticker]['Close'] for ticker in MARKET_TICKERS}, axis=1)
+    days = frame.index.strftime('%Y-%m-%d')
+    for day, row in zip(days, frame.to_numpy()):
+        engine.on_bar(day, dict(zip(MARKET_TICKERS, row)))
+    return engine
+
+
+def _quantamentals():
+    # A backtest rather than a registered strategy, so the module itself is what is timed
+    load_papers(['2020_quantamentals.py'])
+    return sys.modules['paper_2020_quantamentals']
+
+
+def run_cases(market, repeat, charts=True):
+    """Yields (case, seconds) for every benchmarked step over one market."""
+    load_papers()
+    bars = market.bar_dict(MARKET_TICKERS)
+    bars.update(market.bar_dict(market.tickers, fields=['Close']))
+    now = market.dates[-1].to_pydatetime()
+
+    signals = {}
+    for name in PAPERS:
+        strategy = REGISTRY[name]()
+        if name == '2024_lows':
+            strategy.universe = list(market.tickers)
+        result, seconds = timed(lambda: strategy.compute(bars), repeat)
+        signals[name] = result.signals
+        yield f'paper:{name}', seconds
+
+    quantamentals = _quantamentals()
+    tickers = market.tickers[:QUANTAMENTALS_TICKERS]
+    closes = pd.DataFrame({ticker: bars[ticker]['Close'] for ticker in tickers})
+    fundamentals = market.fundamentals(tickers)
+    panel, seconds = timed(lambda: FactorPanel.build(closes, fundamentals), repeat)
+    yield 'quantamentals:factor_panel', seconds
+    data = market.bar_dict(tickers, fields=['Open', 'Close'])
+    _, seconds = timed(lambda: quantamentals.run_vectorized_backtest(data, panel, bars['SPY']['Close'], 1000000), repeat)
+    yield 'quantamentals:backtest', seconds
+
+    (merged_df, inflection_points_dict, master_points), seconds = timed(
+        lambda: build_master(signals, bars['SPY']), repeat)
+    yield 'master:consensus', seconds
+    _, seconds = timed(lambda: [transitions_from_signals(series).points() for series in signals.values()], repeat)
+    yield 'master:inflection_points', seconds
+    _, seconds = timed(lambda: performance_report(signals, bars['SPY']['Close'], now=now), repeat)
+    yield 'analytics:report', seconds
+
+    base_dir = tempfile.mkdtemp(prefix='bench-')
+    series_dir = os.environ.get('PAPERS_SERIES_DIR')
+    os.environ['PAPERS_SERIES_DIR'] = os.path.join(base_dir, 'series')
+    try:
+        strategy = REGISTRY['2014_utilities']()
+        result = strategy.compute(bars)
+        _, seconds = timed(lambda: Materializer('2014', base_dir, now=now).write(
+            result.frame, result.columns, transitions_from_signals(result.signals).points()), repeat)
+        yield 'plotly:paper_files', seconds
+        _, seconds = timed(lambda: publish_master(merged_df, master_points, base_dir, now=now), repeat)
+        yield 'plotly:master_files', seconds
+        if charts:
+            windows = Materializer('master', base_dir, now=now).date_windows()
+            _, seconds = timed(lambda: render_master_charts(merged_df, inflection_points_dict, windows, base_dir,
+                                                             workers=1), repeat)
+            yield 'charts:master_pngs', seconds
+    finally:
+        if series_dir is None:
+            os.environ.pop('PAPERS_SERIES_DIR', None)
+        else:
+            os.environ['PAPERS_SERIES_DIR'] = series_dir
+        shutil.rmtree(base_dir, ignore_errors=True)
+
+    _, seconds = timed(lambda: _replay(bars), repeat)
+    yield 'stream:replay', seconds
+
+
+def load_history(path):
+    """Every recorded entry, oldest first."""
+    if not os.path.exists(path):
+        return []
+    with open(path) as history_file:
+        return [json.loads(line) for line in history_file if line.strip()]
+
+
+def append_history(path, entries):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'a') as history_file:
+        for entry in entries:
+            history_file.write(json.dumps(entry) + '\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the pipeline on synthetic markets.')
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)), help='universe sizes, comma separated')
+    parser.add_argument('--years', type=int, default=40)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-charts', action='store_true', help='skip the matplotlib renders')
+    parser.add_argument('--history', default=HISTORY_PATH, help='JSON lines file results are appended to')
+    args = parser.parse_args()
+
+    previous = {}
+    for entry in load_history(args.history):
+        previous[entry['case'], entry['tickers'], entry['years']] = entry
+    run = {
+        'run_at': datetime.now().isoformat(timespec='seconds'),
+        'commit': _commit(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+    }
+
+    print(f"{'case':28} {'tickers':>7} {'median s':>10} {'min s':>10} {'vs last':>8}")
+    for size in (int(size) for size in args.sizes.split(',')):
+        market, seconds = timed(lambda: SyntheticMarket(size, years=args.years, seed=args.seed), 1)
+        entries = []
+        cases = itertools.chain([('synthetic:generate', seconds)], run_cases(market, args.repeat, not args.no_charts))
+        for case, seconds in cases:
+            entry = {**run, 'case': case, 'tickers': size, 'years': args.years, 'days': len(market.dates),
+                     'repeat': len(seconds), 'median': float(np.median(seconds)), 'min': float(min(seconds))}
+            last = previous.get((case, size, args.years))
+            change = f"{entry['median'] / last['median'] - 1:+.0%}" if last and last['median'] > 0 else '-'
+            print(f"{case:28} {size:>7} {entry['median']:>10.4f} {entry['min']:>10.4f} {change:>8}")
+            entries.append(entry)
+        append_history(args.history, entries)
+        del market
+    print(f"History appended to {args.history}")
+
+
+if __name__ == '__main__':
+    main()
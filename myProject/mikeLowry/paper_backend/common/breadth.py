@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+
+from .price_store import DEFAULT_START, default_store
+
+
+def rolling_min(values, window):
+    """
+    Trailing rolling minimum down axis 0 of a 2D array, like rolling(window, min_periods=1).min().
+
+    Uses the van Herk/Gil-Werman block scheme: per-block prefix and suffix minima computed with
+    np.minimum.accumulate, so the cost is O(rows x columns) whatever the window length.
+    Missing values must already be +inf.
+    """
+    rows, columns = values.shape
+    length = -(-(window - 1 + rows) // window) * window
+    padded = np.full((length, columns), np.inf, dtype=values.dtype)
+    padded[window - 1:window - 1 + rows] = values
+    blocks = padded.reshape(length // window, window, columns)
+    prefix = np.minimum.accumulate(blocks, axis=1).reshape(length, columns)
+    suffix = np.minimum.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].reshape(length, columns)
+    # The window ending at padded row i + window - 1 starts at padded row i
+    return np.minimum(suffix[:rows], prefix[window - 1:window - 1 + rows])
+
+
+class BreadthPanel:
+    """
+    Closes for a whole universe aligned on one calendar as a dense (dates x tickers) array,
+    with a validity mask marking the dates on which each ticker actually traded.
+    """
+
+    def __init__(self, dates, tickers, closes):
+        self.dates = pd.DatetimeIndex(dates)
+        self.tickers = list(tickers)
+        self.closes = closes
+        self.valid = ~np.isnan(closes)
+
+    @classmethod
+    def from_series(cls, series_by_ticker):
+        """Aligns {ticker: close Series} on the union of their dates."""
+        series_by_ticker = {ticker: series for ticker, series in series_by_ticker.items() if not series.empty}
+        stamps = [series.index.to_numpy(dtype='datetime64[ns]') for series in series_by_ticker.values()]
+        calendar = np.unique(np.concatenate(stamps)) if stamps else np.array([], dtype='datetime64[ns]')
+        closes = np.full((len(calendar), len(series_by_ticker)), np.nan)
+        for column, (series, index) in enumerate(zip(series_by_ticker.values(), stamps)):
+            closes[np.searchsorted(calendar, index), column] = series.to_numpy(dtype='float64')
+        return cls(calendar, series_by_ticker.keys(), closes)
+
+    @classmethod
+    def from_store(cls, tickers, start=DEFAULT_START, store=None):
+        """Loads the close history of every ticker from the price store."""
+        store = store or default_store()
+        return cls.from_series({ticker: store.closes(ticker, start=start) for ticker in tickers})
+
+    def at_low(self, window=252, chunk=512):
+        """
+        Flags (dates x tickers) where a close equals the minimum of that ticker's last `window`
+        bars. The window counts each ticker's own bars, so gaps in its history are skipped just
+        as they are when rolling over the ticker's own series. Columns are processed `chunk` at
+        a time to bound memory on wide universes.
+        """
+        flags = np.zeros(self.closes.shape, dtype=bool)
+        for first in range(0, len(self.tickers), chunk):
+            closes = self.closes[:, first:first + chunk]
+            valid = self.valid[:, first:first + chunk]
+            # Pack every ticker's bars to the top of its column so rows count its own bars
+            order = np.argsort(~valid, axis=0, kind='stable')
+            packed = np.take_along_axis(closes, order, axis=0)
+            packed[np.isnan(packed)] = np.inf
+            packed_flags = packed == rolling_min(packed, window)
+            packed_flags &= np.arange(len(packed))[:, None] < valid.sum(axis=0)
+            np.put_along_axis(flags[:, first:first + chunk], order, packed_flags, axis=0)
+        return flags
+
+    def low_percentage(self, window=252):
+        """Fraction of tickers trading on each date that closed at their rolling low."""
+        lows = self.at_low(window).sum(axis=1)
+        totals = self.valid.sum(axis=1)
+        percentage = np.divide(lows, totals, out=np.zeros(len(self.dates)), where=totals > 0)
+        return pd.Series(percentage, index=self.dates)
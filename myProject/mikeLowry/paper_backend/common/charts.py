@@ -0,0 +1,138 @@
+"""
+Master buy-percentage charts.
+
+The gradient is drawn as one LineCollection and each strategy's markers as one scatter, so a
+chart holds a handful of artists however many days it covers. Timeframes render in parallel
+worker processes. matplotlib is only imported once a chart is drawn, on the Agg backend, so
+compute-only runs never load it; PAPERS_HEADLESS=1 makes the pipelines skip rendering.
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .atomic import atomic_open
+
+MARKERS = ['o', 's', 'D', '^', 'v', '<', '>', 'p', '*', 'h', 'H', 'x', 'd']
+SIGNAL_COLORS = {'Buy': 'green', 'Sell': 'red'}
+
+
+def headless():
+    """True when PAPERS_HEADLESS is set: runs then write signals and JSON only, no charts."""
+    return os.environ.get('PAPERS_HEADLESS', '').lower() not in ('', '0', 'false')
+
+
+def _format_axis(ax, label):
+    import matplotlib.dates as mdates
+    # Adjust x-axis formatting based on the timeframe
+    if label == '3_Months':
+        ax.xaxis.set_major_locator(mdates.WeekdayLocator())
+        ax.xaxis.set_major_formatter(mdates.DateFormatter('%b %d'))
+        ax.xaxis.set_minor_locator(mdates.DayLocator())
+    elif label == '1_Year':
+        ax.xaxis.set_major_locator(mdates.MonthLocator())
+        ax.xaxis.set_major_formatter(mdates.DateFormatter('%b %Y'))
+        ax.xaxis.set_minor_locator(mdates.WeekdayLocator())
+    else:
+        ax.xaxis.set_major_locator(mdates.YearLocator())
+        ax.xaxis.set_minor_locator(mdates.MonthLocator())
+        ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m'))
+
+
+def render_master_chart(frame, inflection_points_dict, label, start_date, end_date, filename):
+    """
+    Renders SPY with its 200-day SMA, the buy-percentage colour gradient and every strategy's
+    inflection points for one timeframe, and saves it as a PNG.
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import matplotlib.colors as mcolors
+    import matplotlib.dates as mdates
+    from matplotlib.collections import LineCollection
+
+    fig, ax = plt.subplots(figsize=(14, 7))
+
+    # Calculate the scaling factor for marker size
+    num_days = (end_date - start_date).days
+    marker_size = max(20, min(200, 2000 / num_days))  # Adjust min and max sizes as necessary
+
+    norm = mcolors.Normalize(vmin=0, vmax=100)
+    sm = plt.cm.ScalarMappable(cmap='RdYlGn', norm=norm)
+    sm.set_array([])
+
+    # Plot SPY Close price and 200-day SMA
+    ax.plot(frame.index, frame['Close'], label='SPY', color='black', zorder=1)
+    ax.plot(frame.index, frame['200_SMA'], label='200-day SMA', color='blue', linestyle='--', zorder=1)
+
+    # Color gradient for Buy percentage: one segment per day, all in a single collection
+    x = mdates.date2num(frame.index.to_pydatetime())
+    close = frame['Close'].to_numpy()
+    buy_percentage = frame['Buy_Percentage'].to_numpy()[:-1]
+    segments = np.stack([np.column_stack([x[:-1], close[:-1]]), np.column_stack([x[1:], close[1:]])], axis=1)
+    colored = ~np.isnan(buy_percentage)
+    ax.add_collection(LineCollection(segments[colored], colors=plt.cm.RdYlGn(norm(buy_percentage[colored])),
+                                     linewidths=2, zorder=1))
+
+    # Add inflection points for each JSON file, one scatter per strategy
+    handles = []
+    labels = []
+    for idx, (name, inflection_points) in enumerate(inflection_points_dict.items()):
+        marker = MARKERS[idx % len(MARKERS)]  # Cycle through markers if there are more files than markers
+        points = [(date, signal) for date, signal in inflection_points if signal in SIGNAL_COLORS]
+        if points:
+            dates = pd.to_datetime([date for date, _ in points])
+            positions = frame.index.get_indexer(dates)
+            shown = positions >= 0
+            colors = np.array([SIGNAL_COLORS[signal] for _, signal in points])[shown]
+            ax.scatter(frame.index[positions[shown]], close[positions[shown]], color=colors, edgecolor='black',
+                       linewidth=0.5, marker=marker, s=marker_size, zorder=2)
+        # Add one handle per marker for the legend
+        handles.append(ax.scatter([], [], color='black', marker=marker, s=marker_size, label=name))
+        labels.append(name)
+
+    # Formatting the plot
+    ax.set_title(f'SPY with Buy and Sell Signals and Buy Percentage Color Gradient ({label})')
+    ax.set_xlabel('Date')
+    ax.set_ylabel('Price')
+    fig.colorbar(sm, ax=ax, label='Buy Percentage', orientation='vertical')
+    _format_axis(ax, label)
+    plt.setp(ax.get_xticklabels(), rotation=45, ha='right')
+    ax.legend(handles=handles, labels=labels)
+    ax.grid(True)
+
+    # Save plot as PNG, swapped in by rename so the page never shows a partial image
+    with atomic_open(filename, 'wb') as handle:
+        fig.savefig(handle, format='png')
+    plt.close(fig)
+    return filename
+
+
+def _render_job(job):
+    return render_master_chart(*job)
+
+
+def render_master_charts(merged_df, inflection_points_dict, windows, base_dir, workers=None):
+    """
+    Renders every timeframe in windows ({label: (start_date, end_date)}) in parallel worker
+    processes. Each worker only receives its own slice of merged_df. Returns the written paths.
+    """
+    jobs = []
+    for label, (start_date, end_date) in windows.items():
+        filtered_df = merged_df.loc[pd.Timestamp(start_date):pd.Timestamp(end_date)]
+        if filtered_df.empty:
+            print(f"No data available for {label}")
+            continue
+        filename = os.path.join(base_dir, f'master_{label.replace(" ", "_")}.png')
+        jobs.append((filtered_df, inflection_points_dict, label, start_date, end_date, filename))
+    if not jobs:
+        return []
+    workers = workers or min(len(jobs), os.cpu_count() or 1)
+    if workers == 1:
+        return [_render_job(job) for job in jobs]
+    # The runner calls this from a thread pool, and forking a multithreaded process can copy
+    # locks held by other threads into the child, so workers are spawned fresh instead
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        return list(pool.map(_render_job, jobs))
@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+
+from .signal_store import BUY, MISSING, SELL, encode_signals
+
+
+class ConsensusMatrix:
+    """
+    Every strategy's signal series aligned into one (strategies x dates) int8 matrix.
+
+    Entries hold the BUY/SELL codes, or MISSING on dates a strategy has no signal for, so
+    tallies across strategies are column reductions rather than per-date dict updates.
+    """
+
+    def __init__(self, names, dates, codes):
+        self.names = list(names)
+        self.dates = dates
+        self.codes = codes
+
+    @classmethod
+    def from_signals(cls, signals_by_strategy):
+        """Builds the matrix from {strategy name: {date: 'Buy'/'Sell'}} on the union of their dates."""
+        encoded = [encode_signals(signals) for signals in signals_by_strategy.values()]
+        all_dates = [dates for dates, _ in encoded]
+        calendar = np.unique(np.concatenate(all_dates)) if all_dates else np.array([], dtype='datetime64[D]')
+        codes = np.full((len(encoded), len(calendar)), MISSING, dtype=np.int8)
+        for row, (dates, series) in enumerate(encoded):
+            codes[row, np.searchsorted(calendar, dates)] = series
+        return cls(signals_by_strategy.keys(), calendar, codes)
+
+    def _weights(self, weights):
+        if weights is None:
+            return np.ones(len(self.names))
+        return np.array([weights.get(name, 1.0) for name in self.names], dtype='float64')
+
+    def counts(self):
+        """Returns (buy count, reporting strategy count) per date."""
+        buys = (self.codes == BUY).sum(axis=0)
+        totals = (self.codes != MISSING).sum(axis=0)
+        return buys, totals
+
+    def contributions(self, weights=None):
+        """
+        Per-strategy share of the buy percentage, as a (strategies x dates) float array whose
+        columns sum to buy_percentage(). Weights default to 1 for every strategy.
+        """
+        weight = self._weights(weights)[:, None]
+        present = (self.codes != MISSING) * weight
+        total = present.sum(axis=0)
+        buys = (self.codes == BUY) * weight
+        return np.divide(buys * 100, total, out=np.zeros(buys.shape), where=total > 0)
+
+    def buy_percentage(self, weights=None):
+        """Weighted percentage of reporting strategies saying Buy on each date (NaN if none report)."""
+        weight = self._weights(weights)
+        total = weight @ (self.codes != MISSING)
+        buys = weight @ (self.codes == BUY)
+        return np.divide(buys * 100, total, out=np.full(len(self.dates), np.nan), where=total > 0)
+
+    def majority_codes(self, weights=None, threshold=50):
+        """Consensus as a signal series: BUY where the buy percentage reaches threshold, else SELL."""
+        percentage = self.buy_percentage(weights)
+        return np.where(percentage >= threshold, BUY, SELL).astype(np.int8)
+
+    def to_frame(self, weights=None):
+        """Buy percentage as a DataFrame indexed by Date, the shape main.py joins onto SPY."""
+        return pd.DataFrame({'Buy_Percentage': self.buy_percentage(weights)},
+                            index=pd.DatetimeIndex(self.dates.astype('datetime64[ns]'), name='Date'))
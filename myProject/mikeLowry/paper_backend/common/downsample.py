@@ -0,0 +1,75 @@
+"""
+Point-budget downsampling for chart series.
+
+Largest-Triangle-Three-Buckets keeps the first and last points and, from each bucket in
+between, the point forming the largest triangle with the previously kept point and the mean
+of the next bucket, so peaks and troughs survive the reduction.
+"""
+import numpy as np
+
+
+def lttb_indices(x, y, max_points):
+    """
+    Returns the sorted positions LTTB keeps out of len(x) points (all of them when the series
+    already fits the budget). NaN values in y are never preferred over real ones.
+    """
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+    n = len(x)
+    if max_points >= n or max_points < 3:
+        return np.arange(n)
+
+    # max_points - 2 buckets over the points between the fixed first and last one; the spacing is
+    # at least one point, so no bucket is empty
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+    starts = edges[:-1]
+    widths = np.diff(edges)
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    filled = np.where(np.isnan(y), np.nanmean(y) if not np.isnan(y).all() else 0.0, y)
+
+    # Mean of each bucket's successor (the last one's is the tail up to and including n - 1), all
+    # in one pass
+    next_starts = edges[1:]
+    next_sizes = np.diff(np.append(next_starts, n))
+    avg_x = np.add.reduceat(x, next_starts) / next_sizes
+    avg_y = np.add.reduceat(filled, next_starts) / next_sizes
+
+    # Buckets as rows of a padded (buckets x widest) view. With the previous pick k, a candidate's
+    # doubled triangle area is |x_k * P + y_k * Q + R|, where P, Q and R only depend on the
+    # candidate and the next bucket's mean, so they are computed for every bucket at once
+    offsets = np.arange(widths.max())
+    index = np.minimum(starts[:, None] + offsets, n - 1)
+    bucket_x = x[index]
+    bucket_y = filled[index]
+    coefficients = np.empty(index.shape + (3,))
+    np.subtract(bucket_y, avg_y[:, None], out=coefficients[..., 0])
+    np.subtract(avg_x[:, None], bucket_x, out=coefficients[..., 1])
+    np.multiply(bucket_x, avg_y[:, None], out=coefficients[..., 2])
+    coefficients[..., 2] -= avg_x[:, None] * bucket_y
+    # Padding and NaN points never win the argmax
+    penalty = np.where((offsets >= widths[:, None]) | np.isnan(y[index]), -np.inf, 0.0)
+
+    # Each pick depends on the one before it, so only this one product and argmax per bucket
+    # stays sequential
+    point = np.ones(3)
+    kept = 0
+    for bucket in range(len(starts)):
+        point[0] = x[kept]
+        point[1] = filled[kept]
+        area = np.abs(coefficients[bucket] @ point) + penalty[bucket]
+        kept = starts[bucket] + int(np.argmax(area))
+        selected[bucket + 1] = kept
+    return selected
+
+
+def downsample_indices(x, y, max_points, keep=None):
+    """
+    LTTB positions merged with the positions in keep (e.g. signal transitions, which the chart
+    has to be able to place on the line). The result may exceed max_points by len(keep).
+    """
+    indices = lttb_indices(x, y, max_points)
+    if keep is not None and len(keep):
+        indices = np.union1d(indices, np.asarray(keep, dtype=np.int64))
+    return indices
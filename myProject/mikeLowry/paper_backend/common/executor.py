@@ -0,0 +1,72 @@
+"""
+Per-ticker map/reduce on a process pool.
+
+Tickers are sent to workers in chunks so small tasks do not pay one round-trip each, errors are
+caught per ticker inside the worker, and results are yielded as soon as their chunk finishes.
+`func` must be a module-level function so it can be pickled.
+"""
+import logging
+import os
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+
+def default_workers():
+    """Worker count from PAPERS_WORKERS, defaulting to the number of cores."""
+    return int(os.environ.get('PAPERS_WORKERS', 0)) or os.cpu_count() or 1
+
+
+def _run_chunk(func, chunk):
+    results = []
+    for ticker, args in chunk:
+        try:
+            results.append((ticker, func(ticker, *args), None))
+        except Exception:
+            results.append((ticker, None, traceback.format_exc(limit=3)))
+    return results
+
+
+def map_tickers(func, tickers, payloads=None, workers=None, chunksize=None):
+    """
+    Calls func(ticker) (or func(ticker, payloads[ticker])) for every ticker across a process
+    pool and yields (ticker, result, error) tuples as they complete, in completion order.
+    error is None on success and a formatted traceback when that ticker raised.
+    """
+    tickers = list(tickers)
+    workers = workers or default_workers()
+    if chunksize is None:
+        # A few chunks per worker keeps the pool balanced without one task per ticker
+        chunksize = max(1, min(64, len(tickers) // (workers * 4)))
+    items = [(ticker, (payloads[ticker],) if payloads is not None else ()) for ticker in tickers]
+    chunks = [items[i:i + chunksize] for i in range(0, len(items), chunksize)]
+
+    if workers == 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            yield from _run_chunk(func, chunk)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(_run_chunk, func, chunk): chunk for chunk in chunks}
+        for future in as_completed(futures):
+            try:
+                results = future.result()
+            except Exception as e:
+                # A crashed worker takes its whole chunk down, but not the rest of the run
+                results = [(ticker, None, f'{type(e).__name__}: {e}') for ticker, _ in futures[future]]
+            yield from results
+
+
+def map_reduce_tickers(func, tickers, reducer, initial, payloads=None, workers=None, chunksize=None):
+    """
+    Folds successful per-ticker results into initial with reducer(accumulator, ticker, result).
+    Returns (accumulator, failures) where failures maps ticker -> error text.
+    """
+    accumulator = initial
+    failures = {}
+    for ticker, result, error in map_tickers(func, tickers, payloads, workers, chunksize):
+        if error is not None:
+            logging.warning(f"{ticker} failed: {error}")
+            failures[ticker] = error
+        else:
+            accumulator = reducer(accumulator, ticker, result)
+    return accumulator, failures
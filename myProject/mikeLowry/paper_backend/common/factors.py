@@ -0,0 +1,125 @@
+"""
+Factor panel: every factor computed once across all tickers.
+
+Technical factors run on the whole (date x ticker) close frame at once, fundamental factors are
+spread onto the same grid, and the result is one (factor x date x ticker) float32 array that can
+be saved as .npy and memory-mapped back by later runs and the backtester. A saved panel carries
+a digest of the closes and fundamentals it was built from, so revised inputs rebuild it.
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from .atomic import atomic_open
+
+TECHNICAL_FACTORS = ['Momentum_6m', 'Momentum_12m', 'Volatility', 'SMA']
+FUNDAMENTAL_FACTORS = ['EBIT/EV', 'Price/Sales', 'ROE', 'ROIC', 'Gross Profitability']
+
+
+def technical_factors(closes):
+    """{factor: (date x ticker) frame} from a (date x ticker) frame of adjusted closes."""
+    return {
+        'Momentum_6m': closes.pct_change(126),  # 6 months momentum
+        'Momentum_12m': closes.pct_change(252),  # 12 months momentum
+        'Volatility': closes.rolling(window=252).std(),  # 1 year rolling volatility
+        'SMA': closes.rolling(window=200).mean(),  # 200-day simple moving average
+    }
+
+
+def fundamental_factor(index, fundamental_data, tickers, factor):
+    """
+    (date x ticker) frame of one fundamental metric. Per-report-date series are aligned on
+    their dates and scalars fill the whole column, as column assignment on the price frame does.
+    """
+    columns = {}
+    for ticker in tickers:
+        metrics = fundamental_data.get(ticker)
+        if metrics is None:
+            columns[ticker] = pd.Series(np.nan, index=index)
+            continue
+        values = metrics['EBIT'] / metrics['EV'] if factor == 'EBIT/EV' else metrics[factor]
+        columns[ticker] = values.reindex(index) if isinstance(values, pd.Series) else pd.Series(values, index=index)
+    return pd.DataFrame(columns, index=index, dtype='float64')
+
+
+def input_digest(closes, fundamental_data=None):
+    """
+    Hex digest of a (date x ticker) close frame and each ticker's fundamental metrics. Any
+    revised close, including adjusted history, or restated metric changes it.
+    """
+    digest = hashlib.sha256()
+    digest.update(','.join(map(str, closes.columns)).encode())
+    digest.update(closes.index.asi8.tobytes())
+    digest.update(np.ascontiguousarray(closes.to_numpy(dtype='float64')).tobytes())
+    for ticker in sorted(fundamental_data or {}):
+        metrics = fundamental_data[ticker]
+        digest.update(f'|{ticker}'.encode())
+        for name in sorted(metrics):
+            value = metrics[name]
+            digest.update(f'|{name}'.encode())
+            if isinstance(value, pd.Series):
+                digest.update(value.index.astype(str).str.cat(sep=',').encode())
+                digest.update(np.ascontiguousarray(value.to_numpy(dtype='float64')).tobytes())
+            else:
+                digest.update(repr(value).encode())
+    return digest.hexdigest()
+
+
+class FactorPanel:
+    """
+    (factor x date x ticker) float32 values with their factor, date and ticker labels, and the
+    input_digest of the data they were computed from.
+    """
+
+    def __init__(self, factors, dates, tickers, values, digest=None):
+        self.factors = list(factors)
+        self.dates = pd.DatetimeIndex(dates)
+        self.tickers = list(tickers)
+        self.values = values
+        self.digest = digest
+        self._positions = {factor: i for i, factor in enumerate(self.factors)}
+
+    @classmethod
+    def build(cls, closes, fundamental_data=None, technical=TECHNICAL_FACTORS, fundamental=FUNDAMENTAL_FACTORS):
+        """Computes the technical factors of closes and, if given, the fundamental ones."""
+        tickers = list(closes.columns)
+        frames = {name: frame for name, frame in technical_factors(closes).items() if name in technical}
+        if fundamental_data is not None:
+            for factor in fundamental:
+                frames[factor] = fundamental_factor(closes.index, fundamental_data, tickers, factor)
+        values = np.empty((len(frames), len(closes.index), len(tickers)), dtype=np.float32)
+        for i, frame in enumerate(frames.values()):
+            values[i] = frame.to_numpy(dtype='float32')
+        return cls(frames, closes.index, tickers, values, digest=input_digest(closes, fundamental_data))
+
+    def array(self, factor):
+        """The (date x ticker) array of one factor (a view, memory-mapped if the panel is)."""
+        return self.values[self._positions[factor]]
+
+    def frame(self, factor):
+        return pd.DataFrame(self.array(factor), index=self.dates, columns=self.tickers)
+
+    def save(self, directory):
+        """Writes values.npy and panel.json into directory, each replaced by rename."""
+        os.makedirs(directory, exist_ok=True)
+        with atomic_open(os.path.join(directory, 'values.npy'), 'wb') as handle:
+            np.save(handle, np.ascontiguousarray(self.values, dtype=np.float32))
+        with atomic_open(os.path.join(directory, 'panel.json')) as json_file:
+            json.dump({'factors': self.factors, 'dates': self.dates.strftime('%Y-%m-%d').tolist(),
+                       'tickers': self.tickers, 'digest': self.digest}, json_file)
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        """Reads a saved panel, memory-mapping the values unless mmap is False."""
+        with open(os.path.join(directory, 'panel.json'), 'r') as json_file:
+            meta = json.load(json_file)
+        values = np.load(os.path.join(directory, 'values.npy'), mmap_mode='r' if mmap else None)
+        return cls(meta['factors'], pd.DatetimeIndex(meta['dates']), meta['tickers'], values, meta.get('digest'))
+
+    def matches(self, dates, tickers, factors, digest):
+        """Whether this panel covers exactly these dates, tickers and factors, computed from the inputs with this digest."""
+        return (self.digest is not None and self.digest == digest and self.tickers == list(tickers)
+                and set(factors) <= set(self.factors) and self.dates.equals(pd.DatetimeIndex(dates)))
@@ -0,0 +1,186 @@
+"""
+On-disk store of company fundamentals.
+
+Statements are kept per ticker and report date in <TICKER>.json, refreshed once they are older
+than the TTL. Fundamentals only change quarterly, so most runs never touch the network, and the
+tickers that do need fetching are fetched concurrently.
+"""
+import json
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+STATEMENTS = ['financials', 'balance_sheet', 'cashflow']
+INFO_FIELDS = ['priceToSalesTrailing12Months']
+DEFAULT_STORE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'fundamentals'))
+
+
+def statement_to_records(frame):
+    """(report date x line item) frame -> {'YYYY-MM-DD': {item: value or None}}."""
+    records = {}
+    for report_date, row in frame.iterrows():
+        records[pd.Timestamp(report_date).strftime('%Y-%m-%d')] = {
+            str(item): None if pd.isna(value) else float(value)
+            for item, value in row.items()
+        }
+    return records
+
+
+def records_to_statement(records):
+    """Inverse of statement_to_records, with report dates as a sorted DatetimeIndex."""
+    if not records:
+        return pd.DataFrame(index=pd.DatetimeIndex([], name='Date'))
+    frame = pd.DataFrame.from_dict(records, orient='index').astype('float64')
+    frame.index = pd.DatetimeIndex(frame.index, name='Date')
+    return frame.sort_index()
+
+
+class YahooFundamentalsSource:
+    """Fetches statements from Yahoo Finance, one Ticker object per call."""
+
+    def fetch(self, ticker):
+        import yfinance as yf
+        ticker_data = yf.Ticker(ticker)
+        statements = {}
+        for name in STATEMENTS:
+            # yfinance returns line items as rows and report dates as columns
+            frame = getattr(ticker_data, name)
+            statements[name] = statement_to_records(frame.T if frame is not None else pd.DataFrame())
+        info = ticker_data.info or {}
+        return {'statements': statements, 'info': {field: info.get(field) for field in INFO_FIELDS}}
+
+
+class JsonFundamentalsSource:
+    """Reads <directory>/<TICKER>.json fixtures ({'statements': ..., 'info': ...}) to run offline."""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def fetch(self, ticker):
+        path = os.path.join(self.directory, f'{ticker}.json')
+        if not os.path.exists(path):
+            return {'statements': {name: {} for name in STATEMENTS}, 'info': {}}
+        with open(path, 'r') as json_file:
+            return json.load(json_file)
+
+
+class Fundamentals:
+    """One ticker's statements as (report date x line item) frames, plus the info fields."""
+
+    def __init__(self, ticker, statements, info, fetched_at):
+        self.ticker = ticker
+        self.statements = {name: records_to_statement(statements.get(name, {})) for name in STATEMENTS}
+        self.info = info
+        self.fetched_at = fetched_at
+
+    def __getattr__(self, name):
+        if name in STATEMENTS:
+            return self.statements[name]
+        raise AttributeError(name)
+
+    @property
+    def empty(self):
+        return all(frame.empty for frame in self.statements.values())
+
+
+class FundamentalsStore:
+    """
+    Per-ticker fundamentals in front of a pluggable source. Copies younger than max_age are
+    served from memory or disk; the rest are fetched on up to workers threads.
+    """
+
+    def __init__(self, directory=DEFAULT_STORE_DIR, source=None, max_age=timedelta(days=7), workers=8):
+        self.directory = directory
+        self.source = source if source is not None else YahooFundamentalsSource()
+        self.max_age = max_age
+        self.workers = workers
+        self._memory = {}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def get(self, ticker):
+        """Returns the Fundamentals for ticker, fetching them if missing or stale."""
+        return self.get_many([ticker]).get(ticker)
+
+    def get_many(self, tickers):
+        """
+        Returns {ticker: Fundamentals} for every ticker that could be served. A failed fetch is
+        logged and falls back to a stale copy when there is one.
+        """
+        now = datetime.now()
+        entries = {}
+        stale = []
+        for ticker in tickers:
+            entry = self._cached(ticker)
+            if entry is not None:
+                entries[ticker] = entry
+            if entry is None or now - entry['fetched_at'] > self.max_age:
+                stale.append(ticker)
+
+        if stale:
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(stale))) as pool:
+                for ticker, fetched in zip(stale, pool.map(self._fetch, stale)):
+                    if fetched is not None:
+                        entries[ticker] = fetched
+        return {ticker: Fundamentals(ticker, entries[ticker]['statements'], entries[ticker]['info'],
+                                     entries[ticker]['fetched_at'])
+                for ticker in tickers if ticker in entries}
+
+    def _path(self, ticker):
+        return os.path.join(self.directory, f'{ticker}.json')
+
+    def _cached(self, ticker):
+        with self._lock:
+            entry = self._memory.get(ticker)
+        if entry is not None:
+            return entry
+        path = self._path(ticker)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r') as json_file:
+            saved = json.load(json_file)
+        entry = {'statements': saved['statements'], 'info': saved['info'],
+                 'fetched_at': datetime.fromisoformat(saved['fetched_at'])}
+        with self._lock:
+            self._memory[ticker] = entry
+        return entry
+
+    def _fetch(self, ticker):
+        try:
+            fetched = self.source.fetch(ticker)
+        except Exception as e:
+            logging.warning(f"Failed to fetch fundamentals for {ticker}: {e}")
+            return None
+        entry = {'statements': fetched['statements'], 'info': fetched.get('info', {}), 'fetched_at': datetime.now()}
+        # Concurrent fetches of one ticker each write their own temp file before the rename
+        with tempfile.NamedTemporaryFile('w', dir=self.directory, prefix=f'{ticker}.', suffix='.tmp',
+                                         delete=False) as json_file:
+            json.dump({'statements': entry['statements'], 'info': entry['info'],
+                       'fetched_at': entry['fetched_at'].isoformat()}, json_file)
+        os.replace(json_file.name, self._path(ticker))
+        with self._lock:
+            self._memory[ticker] = entry
+        return entry
+
+
+_default_store = None
+
+
+def default_fundamentals_store():
+    """
+    Returns the process-wide fundamentals store. PAPERS_FUNDAMENTALS_FIXTURE_DIR switches the
+    source to local JSON files, PAPERS_FUNDAMENTALS_STORE moves the on-disk copy and
+    PAPERS_FUNDAMENTALS_TTL_DAYS sets how long a copy stays fresh.
+    """
+    global _default_store
+    if _default_store is None:
+        fixture_dir = os.environ.get('PAPERS_FUNDAMENTALS_FIXTURE_DIR')
+        source = JsonFundamentalsSource(fixture_dir) if fixture_dir else YahooFundamentalsSource()
+        max_age = timedelta(days=float(os.environ.get('PAPERS_FUNDAMENTALS_TTL_DAYS', 7)))
+        _default_store = FundamentalsStore(os.environ.get('PAPERS_FUNDAMENTALS_STORE', DEFAULT_STORE_DIR), source, max_age)
+    return _default_store
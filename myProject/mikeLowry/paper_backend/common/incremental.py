@@ -0,0 +1,323 @@
+"""
+Incremental signal updates.
+
+Each paper's signal is rebuilt from a small rolling state instead of the full history, so a
+daily run only touches the bars that arrived since the last one. Run from paper_backend with
+`python -m common.incremental [--rebuild] [names...]`.
+"""
+import argparse
+import json
+import os
+from collections import deque
+from datetime import date as Date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from .atomic import atomic_open
+from .breadth import BreadthPanel
+from .price_store import default_store
+from .signal_store import append_signals, signals_path, write_signals
+
+STATE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'state'))
+
+
+class CanaryState:
+    """5% canary: Sell when the rolling sum of daily returns drops below the threshold."""
+
+    join = 'inner'
+
+    def __init__(self, ticker='SPY', window=5, threshold=-0.05, start='1980-01-01',
+                 last_close=None, returns=None, pending_date=None):
+        self.ticker = ticker
+        self.window = window
+        self.threshold = threshold
+        self.start = start
+        self.last_close = last_close
+        self.returns = deque(returns or [], maxlen=window)
+        self.pending_date = pending_date
+        # Running (compensated) sum of the window's returns and how many of them are undefined,
+        # so a bar costs O(1) whatever the window
+        self.total = 0.0
+        self.compensation = 0.0
+        self.undefined = 0
+        for value in self.returns:
+            self._count(value, 1)
+
+    def _count(self, value, sign):
+        if value is None:
+            self.undefined += sign
+            return
+        # Kahan summation keeps adding and removing returns from drifting
+        step = sign * value - self.compensation
+        total = self.total + step
+        self.compensation = (total - self.total) - step
+        self.total = total
+
+    @property
+    def tickers(self):
+        return [self.ticker]
+
+    def update(self, date, closes):
+        close = closes[0]
+        # The first bar has no return, which keeps the window undefined like pct_change()
+        value = close / self.last_close - 1 if self.last_close is not None else None
+        if len(self.returns) == self.window:
+            self._count(self.returns[0], -1)
+        self.returns.append(value)
+        self._count(value, 1)
+        self.last_close = close
+        defined = len(self.returns) == self.window and self.undefined == 0
+        signal = 'Sell' if defined and self.total < self.threshold else 'Buy'
+        # The paper shifts the signal back one day, so a bar settles the previous date
+        emitted = [(self.pending_date, signal)] if self.pending_date is not None else []
+        self.pending_date = date
+        return emitted
+
+    def to_dict(self):
+        return {
+            'ticker': self.ticker, 'window': self.window, 'threshold': self.threshold,
+            'start': self.start, 'last_close': self.last_close, 'returns': list(self.returns),
+            'pending_date': self.pending_date,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+
+class RelativeStrengthState:
+    """
+    Weekly relative strength: Buy while the ratio of ticker to market closes is down over the
+    lookback. Daily bars take the signal of the last completed week, as the papers' ffill does.
+    """
+
+    join = 'inner'
+
+    def __init__(self, ticker, market='SPY', lookback=4, start='1980-01-01',
+                 week=None, week_ratio=None, weekly_ratios=None, weekly_signal=None):
+        self.ticker = ticker
+        self.market = market
+        self.lookback = lookback
+        self.start = start
+        self.week = week
+        self.week_ratio = week_ratio
+        self.weekly_ratios = deque(weekly_ratios or [], maxlen=lookback + 1)
+        self.weekly_signal = weekly_signal
+
+    @property
+    def tickers(self):
+        return [self.ticker, self.market]
+
+    def _close_week(self):
+        self.weekly_ratios.append(self.week_ratio)
+        if len(self.weekly_ratios) > self.lookback:
+            change = self.weekly_ratios[-1] / self.weekly_ratios[0] - 1
+            self.weekly_signal = 'Buy' if change < 0 else 'Sell'
+        else:
+            self.weekly_signal = 'Sell'
+
+    def update(self, date, closes):
+        # Intraday bars ('YYYY-MM-DD HH:MM') fall in the week of their day
+        day = Date.fromisoformat(date[:10])
+        week = (day + timedelta(days=6 - day.weekday())).isoformat()
+        if self.week is not None and week != self.week:
+            # Weeks without bars carry the previous ratio forward
+            skipped = (Date.fromisoformat(week) - Date.fromisoformat(self.week)).days // 7
+            for _ in range(skipped):
+                self._close_week()
+        self.week = week
+        self.week_ratio = closes[0] / closes[1]
+        return [(date, self.weekly_signal)] if self.weekly_signal is not None else []
+
+    def to_dict(self):
+        return {
+            'ticker': self.ticker, 'market': self.market, 'lookback': self.lookback,
+            'start': self.start, 'week': self.week, 'week_ratio': self.week_ratio,
+            'weekly_ratios': list(self.weekly_ratios), 'weekly_signal': self.weekly_signal,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+
+class RollingLowState:
+    """Tracks whether each new close is the low of the last `window` bars, in O(1) per bar."""
+
+    def __init__(self, window=252, count=0, candidates=None):
+        self.window = window
+        self.count = count
+        # Monotonic deque of (bar number, close); the front is always the window minimum
+        self.candidates = deque(tuple(item) for item in (candidates or []))
+
+    def update(self, close):
+        while self.candidates and self.candidates[-1][1] > close:
+            self.candidates.pop()
+        self.candidates.append((self.count, close))
+        while self.candidates[0][0] <= self.count - self.window:
+            self.candidates.popleft()
+        self.count += 1
+        return close == self.candidates[0][1]
+
+    def to_dict(self):
+        return {'window': self.window, 'count': self.count, 'candidates': [list(item) for item in self.candidates]}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+
+class RippleState:
+    """
+    Ripple breadth: Sell on a selling climax, when at least `climax` of the universe closes at
+    its 52-week low on a market trading day.
+    """
+
+    join = 'outer'
+
+    def __init__(self, universe, market='SPY', window=252, climax=0.5, start='1980-01-01',
+                 signal_start='2005-01-01', lows=None):
+        self.universe = list(universe)
+        self.market = market
+        self.window = window
+        self.climax = climax
+        self.start = start
+        self.signal_start = signal_start
+        lows = lows or {}
+        self.lows = {ticker: RollingLowState.from_dict(lows[ticker]) if ticker in lows else RollingLowState(window)
+                     for ticker in self.universe}
+
+    @property
+    def tickers(self):
+        return self.universe + [self.market]
+
+    def update(self, date, closes):
+        at_low = 0
+        total = 0
+        for ticker, close in zip(self.universe, closes):
+            if np.isnan(close):
+                continue
+            at_low += self.lows[ticker].update(close)
+            total += 1
+        if np.isnan(closes[-1]) or date < self.signal_start:
+            return []
+        percentage = at_low / total if total > 0 else 0
+        return [(date, 'Sell' if percentage >= self.climax else 'Buy')]
+
+    def replay(self, frame):
+        """Processes a full history at once with the breadth engine instead of bar by bar."""
+        panel = BreadthPanel(frame.index, self.universe, frame[self.universe].to_numpy(dtype='float64'))
+        percentage = panel.low_percentage(self.window).to_numpy()
+        # Only each ticker's last window of bars matters for the rolling lows going forward
+        for column, ticker in enumerate(self.universe):
+            for close in panel.closes[panel.valid[:, column], column][-self.window:]:
+                self.lows[ticker].update(close)
+        emit = frame[self.market].notna().to_numpy() & (frame.index >= self.signal_start)
+        return [(timestamp.strftime('%Y-%m-%d'), 'Sell' if value >= self.climax else 'Buy')
+                for timestamp, value in zip(frame.index[emit], percentage[emit])]
+
+    def to_dict(self):
+        return {
+            'universe': self.universe, 'market': self.market, 'window': self.window,
+            'climax': self.climax, 'start': self.start, 'signal_start': self.signal_start,
+            'lows': {ticker: low.to_dict() for ticker, low in self.lows.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+
+def _ripple_state():
+    from .universe import ripple_universe
+    return RippleState(ripple_universe())
+
+
+# buy_sell_dicts name -> (state class, factory for a fresh state)
+STRATEGIES = {
+    '2014_utilities': (RelativeStrengthState, lambda: RelativeStrengthState('XLU')),
+    '2016_leverage': (RelativeStrengthState, lambda: RelativeStrengthState('SPXL')),
+    '2023_canary': (CanaryState, lambda: CanaryState()),
+    '2024_lows': (RippleState, _ripple_state),
+}
+
+
+def state_path(name):
+    return os.path.join(STATE_DIR, f'{name}.json')
+
+
+def load_state(name):
+    """Returns (state, last processed date) for a strategy, or (None, None) if never run."""
+    path = state_path(name)
+    if not os.path.exists(path):
+        return None, None
+    with open(path, 'r') as state_file:
+        saved = json.load(state_file)
+    state_cls = STRATEGIES[name][0]
+    return state_cls.from_dict(saved['state']), saved['last_date']
+
+
+def save_state(name, state, last_date):
+    os.makedirs(STATE_DIR, exist_ok=True)
+    with atomic_open(state_path(name)) as state_file:
+        json.dump({'last_date': last_date, 'state': state.to_dict()}, state_file)
+
+
+def new_bars(state, start, store=None):
+    """Returns the closes of every ticker the state needs from start on, as a (date x ticker) frame."""
+    store = store or default_store()
+    closes = {ticker: store.closes(ticker, start=start) for ticker in state.tickers}
+    frame = pd.concat(closes, axis=1, join=state.join)
+    return frame[state.tickers].sort_index()
+
+
+def update_strategy(name, store=None, rebuild=False):
+    """
+    Extends one strategy's buy_sell_dicts file with the bars that arrived since its last run.
+    The first run (or rebuild=True) replays the full history once and writes the file in full.
+    The newest bar is held back until a later bar confirms it, since it may still be a partial
+    intraday bar that the price store replaces on its next refresh. Returns the (date, signal)
+    pairs that were emitted.
+    """
+    state, last_date = (None, None) if rebuild else load_state(name)
+    bootstrap = state is None
+    if bootstrap:
+        state = STRATEGIES[name][1]()
+        start = state.start
+    else:
+        start = (Date.fromisoformat(last_date) + timedelta(days=1)).isoformat()
+
+    frame = new_bars(state, start, store).iloc[:-1]
+    emitted = []
+    if bootstrap and hasattr(state, 'replay'):
+        emitted = state.replay(frame)
+        last_date = frame.index[-1].strftime('%Y-%m-%d') if not frame.empty else None
+    else:
+        for timestamp, closes in zip(frame.index, frame.to_numpy(dtype='float64')):
+            day = timestamp.strftime('%Y-%m-%d')
+            emitted.extend(state.update(day, closes))
+            last_date = day
+
+    path = signals_path(name)
+    if bootstrap:
+        write_signals(path, dict(emitted))
+    else:
+        append_signals(path, emitted)
+    if last_date is not None:
+        save_state(name, state, last_date)
+    return emitted
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Extend buy_sell_dicts with newly arrived bars.')
+    parser.add_argument('names', nargs='*', default=list(STRATEGIES), help='strategies to update')
+    parser.add_argument('--rebuild', action='store_true', help='replay the full history')
+    args = parser.parse_args()
+    for name in args.names:
+        emitted = update_strategy(name, rebuild=args.rebuild)
+        print(f"{name}: {len(emitted)} new signals")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,221 @@
+"""
+Lightweight instrumentation: nested timing spans, counters and histograms.
+
+`with span('compute'):` times a block. Spans opened inside it, including in threads started
+with the caller's context (see runner.run_graph), are recorded as its children, so a run report
+shows paths such as run/2014_utilities/compute. count() adds to a counter and observe() records
+a value in a histogram. Everything lives in the process-wide REGISTRY, which prometheus_text()
+renders in the Prometheus text format and write_run_report() dumps as JSON. Work done in pool
+processes is not seen here; callers time it in the worker and count it in the parent.
+"""
+import bisect
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from .atomic import atomic_write
+
+REPORTS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'reports'))
+LATEST_REPORT = 'latest.json'
+NAMESPACE = 'papers'
+# Upper bounds in seconds, from a cached view read to a full network fetch
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+_current_path = contextvars.ContextVar('span_path', default=())
+
+
+class Histogram:
+    """Counts of observed values per bucket (non-cumulative), plus their sum and count."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    """Thread-safe store of counters, histograms and finished spans for one process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started = time.time()
+            self._clock = time.perf_counter()
+            self.counters = {}
+            self.histograms = {}
+            self.spans = []
+
+    def count(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, buckets=BUCKETS, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def finish_span(self, path, started, seconds):
+        record = {
+            'path': '/'.join(path),
+            'name': path[-1],
+            'depth': len(path) - 1,
+            'start': round(started - self._clock, 6),
+            'seconds': round(seconds, 6),
+            'thread': threading.current_thread().name,
+        }
+        with self._lock:
+            self.spans.append(record)
+        self.observe('span_seconds', seconds, span=record['path'])
+
+    def snapshot(self):
+        """Copies of the counters, histograms and spans, taken under the lock."""
+        with self._lock:
+            return dict(self.counters), dict(self.histograms), list(self.spans)
+
+
+REGISTRY = Registry()
+
+
+@contextmanager
+def span(name, registry=REGISTRY):
+    """Times the block as a child of the enclosing span; recorded even when the block raises."""
+    path = _current_path.get() + (name,)
+    token = _current_path.set(path)
+    started = time.perf_counter()
+    try:
+        yield path
+    finally:
+        seconds = time.perf_counter() - started
+        _current_path.reset(token)
+        registry.finish_span(path, started, seconds)
+
+
+def count(name, value=1, **labels):
+    """Adds value to the counter name, e.g. count('rows', len(frame), stage='compute')."""
+    REGISTRY.count(name, value, **labels)
+
+
+def observe(name, value, **labels):
+    """Records value in the histogram name."""
+    REGISTRY.observe(name, value, **labels)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in pairs) + '}'
+
+
+def _bound(bound):
+    return '+Inf' if bound == float('inf') else repr(float(bound))
+
+
+def prometheus_text(registry=REGISTRY, namespace=NAMESPACE):
+    """Every counter and histogram of registry in the Prometheus text exposition format."""
+    counters, histograms, _ = registry.snapshot()
+    lines = []
+    for name in sorted({name for name, _ in counters}):
+        metric = f'{namespace}_{name}_total'
+        lines.append(f'# TYPE {metric} counter')
+        for (key, labels), value in sorted(counters.items()):
+            if key == name:
+                lines.append(f'{metric}{_labels(labels)} {value}')
+    for name in sorted({name for name, _ in histograms}):
+        metric = f'{namespace}_{name}'
+        lines.append(f'# TYPE {metric} histogram')
+        for (key, labels), histogram in sorted(histograms.items(), key=lambda item: item[0]):
+            if key != name:
+                continue
+            cumulative = 0
+            for bound, bucket_count in zip(histogram.buckets + (float('inf'),), histogram.counts):
+                cumulative += bucket_count
+                lines.append(f'{metric}_bucket{_labels(labels, [("le", _bound(bound))])} {cumulative}')
+            lines.append(f'{metric}_sum{_labels(labels)} {histogram.sum:.6f}')
+            lines.append(f'{metric}_count{_labels(labels)} {histogram.count}')
+    return '\n'.join(lines) + '\n' if lines else ''
+
+
+def run_report(registry=REGISTRY, failures=None):
+    """
+    The spans (in start order), counters, a per-path span summary and failures ({step: reason},
+    e.g. the errors of runner.run_graph) as one JSON-ready dict.
+    """
+    counters, _, spans = registry.snapshot()
+    spans = sorted(spans, key=lambda record: record['start'])
+    totals = {}
+    for record in spans:
+        total = totals.setdefault(record['path'], {'path': record['path'], 'calls': 0, 'seconds': 0.0})
+        total['calls'] += 1
+        total['seconds'] = round(total['seconds'] + record['seconds'], 6)
+    return {
+        'started': datetime.fromtimestamp(registry.started).isoformat(timespec='seconds'),
+        'seconds': round(max((record['start'] + record['seconds'] for record in spans), default=0.0)
+                         - min((record['start'] for record in spans), default=0.0), 6),
+        'spans': spans,
+        'stages': sorted(totals.values(), key=lambda total: -total['seconds']),
+        'counters': [{'name': name, 'labels': dict(labels), 'value': value}
+                     for (name, labels), value in sorted(counters.items())],
+        'failures': dict(failures or {}),
+    }
+
+
+def write_run_report(directory=None, registry=REGISTRY, failures=None):
+    """
+    Writes the run report as run_<timestamp>.json and latest.json in directory (default:
+    PAPERS_REPORT_DIR or data/reports). Returns the report.
+    """
+    directory = directory or os.environ.get('PAPERS_REPORT_DIR', REPORTS_DIR)
+    os.makedirs(directory, exist_ok=True)
+    report = run_report(registry, failures)
+    text = json.dumps(report, indent=4)
+    stamp = datetime.fromtimestamp(registry.started).strftime('%Y%m%d_%H%M%S')
+    for name in (f'run_{stamp}.json', LATEST_REPORT):
+        atomic_write(os.path.join(directory, name), text)
+    return report
+
+
+def load_latest_report(directory=None):
+    """The last run report written to directory, or None."""
+    path = os.path.join(directory or os.environ.get('PAPERS_REPORT_DIR', REPORTS_DIR), LATEST_REPORT)
+    try:
+        with open(path) as json_file:
+            return json.load(json_file)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def report_text(report, namespace=NAMESPACE):
+    """A run report's stage totals and counters as Prometheus gauges of the last pipeline run."""
+    lines = [f'# TYPE {namespace}_last_run_seconds gauge', f"{namespace}_last_run_seconds {report['seconds']}"]
+    lines.append(f'# TYPE {namespace}_last_run_stage_seconds gauge')
+    lines.extend(f"{namespace}_last_run_stage_seconds{_labels([('span', stage['path'])])} {stage['seconds']}"
+                 for stage in report['stages'])
+    names = sorted({counter['name'] for counter in report['counters']})
+    for name in names:
+        metric = f'{namespace}_last_run_{name}'
+        lines.append(f'# TYPE {metric} gauge')
+        lines.extend(f"{metric}{_labels(sorted(counter['labels'].items()))} {counter['value']}"
+                     for counter in report['counters'] if counter['name'] == name)
+    return '\n'.join(lines) + '\n'
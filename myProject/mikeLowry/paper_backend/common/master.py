@@ -0,0 +1,53 @@
+"""
+Master consensus stage: every strategy's signals against SPY, and the artifacts drawn from it.
+"""
+import numpy as np
+
+from .consensus import ConsensusMatrix
+from .materialize import Materializer
+from .series_store import write_series
+from .signal_store import BUY, MISSING, SELL
+from .transitions import find_transitions, transitions_from_signals
+
+MASTER_LAYOUT = {
+    'xaxis': {'title': 'Date'},
+    'yaxis': {'title': 'Price'},
+    'coloraxis': {'colorbar': {'title': 'Buy Percentage'}},
+}
+
+
+def build_master(signals_by_strategy, spy_data, weights=None):
+    """
+    Aligns {strategy name: signals} into the consensus and joins its buy percentage onto SPY.
+    weights optionally maps strategy names to weights (default 1 each).
+    Returns (merged frame, {'<name>.json': inflection points}, master inflection points).
+    """
+    inflection_points_dict = {f'{name}.json': transitions_from_signals(signals).points()
+                              for name, signals in signals_by_strategy.items()}
+
+    # Align every strategy into one (strategies x dates) matrix
+    consensus = ConsensusMatrix.from_signals(signals_by_strategy)
+    buy_percentage_df = consensus.to_frame(weights)
+
+    # Inflection points of the majority signal across all strategies
+    master_inflection_points = find_transitions(consensus.dates, consensus.majority_codes(weights)).points()
+
+    # Merge SPY data with buy percentage data
+    spy_data = spy_data.copy()
+    spy_data.index = spy_data.index.normalize()
+    spy_data['200_SMA'] = spy_data['Close'].rolling(window=200).mean()
+    merged_df = spy_data.join(buy_percentage_df, how='left')
+    return merged_df, inflection_points_dict, master_inflection_points
+
+
+def publish_master(merged_df, master_inflection_points, base_dir, now=None):
+    """Writes the master series and plotly files; returns the Materializer for its windows."""
+    columns = {'close': 'Close', 'buy_percentage': 'Buy_Percentage'}
+    # The majority signal on each day, as ConsensusMatrix.majority_codes draws it
+    buy_percentage = merged_df['Buy_Percentage'].to_numpy()
+    signals = np.where(np.isnan(buy_percentage), MISSING, np.where(buy_percentage >= 50, BUY, SELL))
+    write_series('master', merged_df.index, {key: merged_df[column].to_numpy() for key, column in columns.items()},
+                 master_inflection_points, signals=signals)
+    materializer = Materializer('master', base_dir, now=now)
+    materializer.write(merged_df, columns, master_inflection_points, layout=MASTER_LAYOUT)
+    return materializer
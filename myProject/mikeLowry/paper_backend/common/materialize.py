@@ -0,0 +1,164 @@
+"""
+One-pass plotly artifact writer.
+
+Every timeframe window is cut from the same sorted frame with index searches against a single
+run date, so the windows of one run always agree. A run is published as a generation: its
+files are written under generations/<prefix>/<generation>/, the stable
+<prefix>_<timeframe>_plotly.json names are swapped in by rename, and
+generations/<prefix>.json is replaced last to point readers at the new set. Readers that
+resolve files through the manifest never see a half-written or mixed set.
+"""
+import json
+import os
+import shutil
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from .atomic import atomic_open, atomic_write
+from .instrument import count
+from .payload import compact_path, compact_payload
+
+TIMEFRAMES = {
+    '3_Months': timedelta(days=90),
+    '1_Year': timedelta(days=365),
+    '5_Years': timedelta(days=5 * 365),
+}
+GENERATIONS_DIR = 'generations'
+KEEP_GENERATIONS = 3
+
+
+def _publish_alias(source, path):
+    # Point the stable name at the generation file without a window where it is partial
+    tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+    try:
+        os.link(source, tmp_path)
+    except OSError:
+        with atomic_open(path, 'wb') as handle, open(source, 'rb') as source_file:
+            shutil.copyfileobj(source_file, handle)
+        return
+    os.replace(tmp_path, path)
+
+
+def _merge(base, extra):
+    merged = dict(base)
+    for key, value in (extra or {}).items():
+        merged[key] = _merge(merged.get(key, {}), value) if isinstance(value, dict) else value
+    return merged
+
+
+class Materializer:
+    """
+    Writes a prefix's plotly artifacts for every timeframe from one frame. now fixes the run
+    date (default: the current time); windows include both their start and end date.
+    """
+
+    def __init__(self, prefix, base_dir, timeframes=TIMEFRAMES, now=None, keep_generations=KEEP_GENERATIONS):
+        self.prefix = prefix
+        self.base_dir = base_dir
+        self.timeframes = timeframes
+        self.run_at = now or datetime.now()
+        self.end_date = pd.Timestamp(self.run_at).date()
+        self.generation = pd.Timestamp(self.run_at).strftime('%Y%m%dT%H%M%S%f')
+        self.keep_generations = keep_generations
+
+    def date_windows(self):
+        """{timeframe: (start date, end date)} for this run."""
+        return {label: (self.end_date - period, self.end_date) for label, period in self.timeframes.items()}
+
+    def windows(self, index):
+        """{timeframe: (start date, end date, lo, hi)} where index[lo:hi] is the window's bars."""
+        days = np.asarray(pd.DatetimeIndex(index).values.astype('datetime64[D]'))
+        windows = {}
+        for label, (start, end) in self.date_windows().items():
+            lo = int(np.searchsorted(days, np.datetime64(start, 'D'), side='left'))
+            hi = int(np.searchsorted(days, np.datetime64(end, 'D'), side='right'))
+            windows[label] = (start, end, lo, hi)
+        return windows
+
+    def write(self, frame, columns, inflection_points, layout=None):
+        """
+        Writes the verbose and compact plotly files of every timeframe as one generation.
+        columns maps payload keys to frame columns, the first one setting the y-axis range;
+        layout is merged over the default axis ranges. Returns the generation manifest.
+        """
+        generation_dir = os.path.join(self.base_dir, GENERATIONS_DIR, self.prefix, self.generation)
+        os.makedirs(generation_dir, exist_ok=True)
+        points = [{'date': date, 'signal': signal} for date, signal in inflection_points]
+        primary = next(iter(columns.values()))
+
+        files = {}
+        for label, (start, end, lo, hi) in self.windows(frame.index).items():
+            data = frame.iloc[lo:hi]
+            window_layout = _merge({
+                'xaxis': {'range': [start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d')]},
+                'yaxis': {'range': [data[primary].min(), data[primary].max()]},
+            }, layout)
+            plotly_data = {'date': data.index.strftime('%Y-%m-%d').tolist()}
+            plotly_data.update({key: data[column].tolist() for key, column in columns.items()})
+            plotly_data['inflection_points'] = points
+            plotly_data['layout'] = window_layout
+            compact = compact_payload(data.index, {key: data[column].to_numpy() for key, column in columns.items()},
+                                      inflection_points, window_layout)
+
+            filename = f'{self.prefix}_{label}_plotly.json'
+            for name, text in ((filename, json.dumps(plotly_data, indent=4)),
+                               (compact_path(filename), json.dumps(compact, separators=(',', ':')))):
+                path = os.path.join(generation_dir, name)
+                data = text.encode('utf-8')
+                atomic_write(path, data)
+                count('bytes', len(data), stage='write', kind='plotly', prefix=self.prefix)
+                files[name] = os.path.relpath(path, self.base_dir)
+
+        # Stable names for direct static links, then the manifest that switches readers over
+        for name, relative in files.items():
+            _publish_alias(os.path.join(self.base_dir, relative), os.path.join(self.base_dir, name))
+        manifest = {
+            'prefix': self.prefix,
+            'generation': self.generation,
+            'created': pd.Timestamp(self.run_at).isoformat(),
+            'files': files,
+        }
+        atomic_write(manifest_path(self.base_dir, self.prefix), json.dumps(manifest, indent=4))
+        self._prune()
+        return manifest
+
+    def _prune(self):
+        # Older generations stay around briefly for readers still holding the previous manifest
+        prefix_dir = os.path.join(self.base_dir, GENERATIONS_DIR, self.prefix)
+        generations = sorted(os.listdir(prefix_dir))
+        for generation in generations[:-self.keep_generations]:
+            if generation != self.generation:
+                shutil.rmtree(os.path.join(prefix_dir, generation), ignore_errors=True)
+
+
+def manifest_path(base_dir, prefix):
+    return os.path.join(base_dir, GENERATIONS_DIR, f'{prefix}.json')
+
+
+_manifests = {}
+_manifests_lock = threading.Lock()
+
+
+def generation_path(base_dir, prefix, filename):
+    """
+    Path of filename in the prefix's current generation, or None when there is no manifest or
+    it does not list the file. The manifest is re-read only when it is replaced.
+    """
+    path = manifest_path(base_dir, prefix)
+    try:
+        stamp = os.stat(path).st_mtime_ns
+    except (FileNotFoundError, ValueError):
+        return None
+    with _manifests_lock:
+        cached = _manifests.get(path)
+    if cached is None or cached[0] != stamp:
+        with open(path) as json_file:
+            cached = (stamp, json.load(json_file))
+        with _manifests_lock:
+            _manifests[path] = cached
+    relative = cached[1]['files'].get(filename)
+    return os.path.join(base_dir, relative) if relative else None
@@ -0,0 +1,59 @@
+"""
+Compact plotly payloads.
+
+Instead of a list of date strings and Python float lists, dates are a start day plus a typed
+array of day offsets, and value columns are base64 typed-array blocks in the
+{'dtype': 'f8', 'bdata': ...} form plotly.js understands. Blocks are encoded straight from the
+numpy buffers.
+"""
+import base64
+
+import numpy as np
+
+COMPACT_FORMAT = 'compact-v1'
+COMPACT_MEDIA_TYPE = 'application/vnd.mikelowry.compact+json'
+
+# numpy dtype -> plotly.js typed-array code (little-endian)
+PLOTLY_DTYPES = {
+    np.dtype('<f8'): 'f8', np.dtype('<f4'): 'f4',
+    np.dtype('<i4'): 'i4', np.dtype('<u4'): 'u4',
+    np.dtype('<i2'): 'i2', np.dtype('<u2'): 'u2',
+    np.dtype('i1'): 'i1', np.dtype('u1'): 'u1',
+}
+
+
+def typed_array(values, dtype='<f8'):
+    """Encodes a 1-D array as a plotly.js typed-array block."""
+    array = np.ascontiguousarray(values, dtype=dtype)
+    return {'dtype': PLOTLY_DTYPES[array.dtype], 'bdata': base64.b64encode(array.data).decode('ascii')}
+
+
+def encode_dates(dates):
+    """Encodes sorted dates as {'start': 'YYYY-MM-DD', 'offsets': typed array of days since start}."""
+    days = np.asarray(dates, dtype='datetime64[D]')
+    if len(days) == 0:
+        return {'start': None, 'offsets': typed_array([], '<u2')}
+    offsets = (days - days[0]).astype(np.int64)
+    return {'start': str(days[0]), 'offsets': typed_array(offsets, '<u2' if offsets[-1] < 2 ** 16 else '<u4')}
+
+
+def compact_path(filename):
+    """Path of the compact twin of a '<name>_plotly.json' file."""
+    return filename[:-len('.json')] + '.compact.json'
+
+
+def compact_payload(dates, columns, inflection_points, layout=None):
+    """
+    Builds a compact payload. columns maps payload keys such as 'close' to numpy-compatible
+    arrays aligned with dates; NaN is kept as-is inside the binary blocks.
+    """
+    payload = {
+        'format': COMPACT_FORMAT,
+        'date': encode_dates(dates),
+        'inflection_points': [{'date': date, 'signal': signal} for date, signal in inflection_points],
+        'layout': layout,
+    }
+    for key, values in columns.items():
+        payload[key] = typed_array(values)
+    return payload
+
@@ -0,0 +1,192 @@
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+BAR_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+DEFAULT_START = '1980-01-01'
+DEFAULT_STORE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'bars'))
+
+
+def empty_bars():
+    """Returns an empty bar frame with the store's column layout."""
+    return pd.DataFrame({column: pd.Series(dtype='float64') for column in BAR_COLUMNS},
+                        index=pd.DatetimeIndex([], name='Date'))
+
+
+def normalize_bars(frame):
+    """Converts a raw bar frame to tz-naive, day-normalized, sorted OHLCV columns."""
+    if frame is None or frame.empty:
+        return empty_bars()
+    frame = frame.copy()
+    index = pd.DatetimeIndex(frame.index)
+    if index.tz is not None:
+        # Keep the exchange-local trading date rather than shifting to UTC
+        index = index.tz_localize(None)
+    frame.index = index.normalize().rename('Date')
+    frame = frame[[column for column in BAR_COLUMNS if column in frame]].astype('float64')
+    frame = frame[~frame.index.duplicated(keep='last')].sort_index()
+    return frame.reindex(columns=BAR_COLUMNS)
+
+
+def _bound(end):
+    return None if end is None else pd.Timestamp(end)
+
+
+class YahooSource:
+    """Fetches daily bars from Yahoo Finance."""
+
+    def fetch(self, ticker, start, end=None):
+        import yfinance as yf
+        hist = yf.Ticker(ticker).history(start=start, end=end, interval='1d')
+        return normalize_bars(hist)
+
+
+class CsvSource:
+    """
+    Reads daily bars from <directory>/<TICKER>.csv fixtures so the pipeline can run offline.
+    Ticker listings such as the S&P 500 come from <directory>/<listing>.txt, one per line.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def listing(self, name):
+        path = os.path.join(self.directory, f'{name}.txt')
+        if not os.path.exists(path):
+            raise FileNotFoundError(f'No {name} listing in the fixture directory: {path}')
+        with open(path) as listing_file:
+            return [line.strip() for line in listing_file if line.strip()]
+
+    def fetch(self, ticker, start, end=None):
+        path = os.path.join(self.directory, f'{ticker}.csv')
+        if not os.path.exists(path):
+            return empty_bars()
+        bars = normalize_bars(pd.read_csv(path, index_col=0, parse_dates=True))
+        return _slice(bars, start, end)
+
+
+def _slice(bars, start, end):
+    # Same convention as yfinance: start inclusive, end exclusive
+    mask = bars.index >= pd.Timestamp(start)
+    if end is not None:
+        mask &= bars.index < pd.Timestamp(end)
+    return bars[mask]
+
+
+class PriceStore:
+    """
+    On-disk columnar store of daily bars in front of a pluggable source.
+
+    Each ticker is kept as one .npz file of column arrays. Reads are served from memory, then
+    disk, and the source is only asked for bars the store does not already hold.
+    """
+
+    def __init__(self, directory=DEFAULT_STORE_DIR, source=None, max_age=timedelta(hours=12)):
+        self.directory = directory
+        self.source = source if source is not None else YahooSource()
+        self.max_age = max_age
+        self._memory = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def history(self, ticker, start=DEFAULT_START, end=None):
+        """Returns daily bars for ticker in [start, end), fetching only what is missing."""
+        bars = self._refresh(ticker, pd.Timestamp(start), end)
+        return _slice(bars, start, end).copy()
+
+    def closes(self, ticker, start=DEFAULT_START, end=None):
+        """Returns the close series for ticker in [start, end)."""
+        return self.history(ticker, start=start, end=end)['Close']
+
+    def _path(self, ticker):
+        return os.path.join(self.directory, f'{ticker}.npz')
+
+    def _refresh(self, ticker, start, end):
+        entry = self._memory.get(ticker) or self._load(ticker)
+        now = datetime.now()
+        if entry is None:
+            bars = self.source.fetch(ticker, start, end)
+            entry = {'bars': bars, 'fetched_from': start, 'fetched_to': _bound(end), 'fetched_at': now}
+            self._save(ticker, entry)
+        else:
+            bars = entry['bars']
+            changed = False
+            if start < entry['fetched_from']:
+                # Older history than anything requested before
+                head = self.source.fetch(ticker, start, entry['fetched_from'])
+                bars = pd.concat([head, bars])
+                entry['fetched_from'] = start
+                changed = True
+            stale = now - entry['fetched_at'] > self.max_age
+            covered = end is not None and not bars.empty and pd.Timestamp(end) <= bars.index[-1]
+            # An earlier call that asked for an explicit end only fetched up to it
+            cut_short = entry['fetched_to'] is not None and (end is None or _bound(end) > entry['fetched_to'])
+            if (stale or cut_short) and not covered:
+                # Re-read from the last stored bar so a partial intraday bar gets replaced
+                tail_start = bars.index[-1] if not bars.empty else entry['fetched_from']
+                tail = self.source.fetch(ticker, tail_start, None)
+                bars = pd.concat([bars, tail])
+                entry['fetched_to'] = None
+                entry['fetched_at'] = now
+                changed = True
+            if changed:
+                entry['bars'] = bars[~bars.index.duplicated(keep='last')].sort_index()
+                self._save(ticker, entry)
+        self._memory[ticker] = entry
+        return entry['bars']
+
+    def _load(self, ticker):
+        path = self._path(ticker)
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as stored:
+            index = pd.DatetimeIndex(stored['date'].astype('datetime64[ns]'), name='Date')
+            bars = pd.DataFrame({column: stored[column] for column in BAR_COLUMNS}, index=index)
+            # Files saved before fetched_to existed keep the age-only refresh
+            fetched_to = pd.Timestamp(stored['fetched_to'][0]) if 'fetched_to' in stored else pd.NaT
+            return {
+                'bars': bars,
+                'fetched_from': pd.Timestamp(stored['fetched_from'][0]),
+                'fetched_to': None if pd.isna(fetched_to) else fetched_to,
+                'fetched_at': pd.Timestamp(stored['fetched_at'][0]).to_pydatetime(),
+            }
+
+    def _save(self, ticker, entry):
+        bars = entry['bars']
+        columns = {column: bars[column].to_numpy(dtype='float64') for column in BAR_COLUMNS}
+        fetched_to = 'NaT' if entry['fetched_to'] is None else entry['fetched_to']
+        # A temp file of its own per writer, so concurrent saves of one ticker (loader processes,
+        # fundamentals threads) never rename each other's half-written file into place
+        with tempfile.NamedTemporaryFile(dir=self.directory, prefix=f'{ticker}.', suffix='.tmp', delete=False) as handle:
+            tmp_path = handle.name
+            try:
+                np.savez(handle,
+                         date=bars.index.to_numpy().astype('datetime64[D]'),
+                         fetched_from=np.array([entry['fetched_from']], dtype='datetime64[D]'),
+                         fetched_to=np.array([fetched_to], dtype='datetime64[D]'),
+                         fetched_at=np.array([entry['fetched_at']], dtype='datetime64[s]'),
+                         **columns)
+            except BaseException:
+                handle.close()
+                os.remove(tmp_path)
+                raise
+        os.replace(tmp_path, self._path(ticker))
+
+
+_default_store = None
+
+
+def default_store():
+    """
+    Returns the process-wide store. PAPERS_FIXTURE_DIR switches the source to local CSV files
+    (and ticker listings to local .txt files) and PAPERS_BAR_STORE overrides where bars are kept
+    on disk.
+    """
+    global _default_store
+    if _default_store is None:
+        fixture_dir = os.environ.get('PAPERS_FIXTURE_DIR')
+        source = CsvSource(fixture_dir) if fixture_dir else YahooSource()
+        _default_store = PriceStore(os.environ.get('PAPERS_BAR_STORE', DEFAULT_STORE_DIR), source)
+    return _default_store
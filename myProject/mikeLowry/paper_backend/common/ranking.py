@@ -0,0 +1,57 @@
+"""
+Cross-sectional ranking and selection on factor arrays.
+
+Inputs are (dates x tickers) arrays, or a single row of one, and every function works on all
+rows at once. NaN marks a ticker without a value on that date: it gets no rank and is never
+selected. Ties resolve the way a stable sorted() over the tickers would, so results match the
+dict-and-sort code they replace.
+"""
+import numpy as np
+
+
+def ordinal_rank(values, ascending=True, tiebreak=None):
+    """
+    1-based ranks along the last axis (1 = best), NaN where values is NaN. Ties go to the lower
+    tiebreak value if one is given, then to the earlier column.
+    """
+    values = np.atleast_2d(np.asarray(values, dtype='float64'))
+    key = values if ascending else -values
+    missing = np.isnan(key)
+    # NaN sorts after every value, so ranked entries come first in each row
+    key = np.where(missing, np.inf, key)
+    if tiebreak is None:
+        order = np.argsort(key, axis=-1, kind='stable')
+    else:
+        secondary = np.where(np.isnan(tiebreak), np.inf, np.atleast_2d(tiebreak))
+        order = np.lexsort((secondary, missing, key), axis=-1)
+    ranks = np.empty(key.shape)
+    np.put_along_axis(ranks, order, np.broadcast_to(np.arange(1, key.shape[-1] + 1), key.shape), axis=-1)
+    ranks[missing] = np.nan
+    return ranks
+
+
+def composite_score(ranks, weights=None):
+    """Weighted sum of several rank arrays; NaN wherever any of them is NaN."""
+    weights = np.ones(len(ranks)) if weights is None else np.asarray(weights, dtype='float64')
+    return sum(weight * np.asarray(rank, dtype='float64') for weight, rank in zip(weights, ranks))
+
+
+def top_k_mask(scores, k, ascending=True):
+    """
+    Boolean mask of the k best scores per row (lowest when ascending), ties going to earlier
+    columns. Uses a partial partition rather than sorting whole rows.
+    """
+    scores = np.atleast_2d(np.asarray(scores, dtype='float64'))
+    key = np.where(np.isnan(scores), np.inf, scores if ascending else -scores)
+    n = key.shape[-1]
+    if k <= 0 or n == 0:
+        return np.zeros(key.shape, dtype=bool)
+    if k >= n:
+        return ~np.isnan(scores)
+    threshold = np.partition(key, k - 1, axis=-1)[:, k - 1:k]
+    better = key < threshold
+    # Fill the remaining places with the earliest columns equal to the threshold
+    ties = key == threshold
+    remaining = k - better.sum(axis=-1, keepdims=True)
+    mask = better | (ties & (np.cumsum(ties, axis=-1) <= remaining))
+    return mask & ~np.isnan(scores)
@@ -0,0 +1,233 @@
+"""
+Runs the papers, the consensus and the master artifacts in one process.
+
+The work is a small dependency graph: bars -> papers -> consensus -> master files, charts and
+analytics. Bars are loaded once for the union of every paper's tickers, nodes whose dependencies
+are done run in parallel threads, and the consensus takes the papers' signals in memory. Every
+node runs in a timing span under 'run' and is counted as ok, failed or skipped; main() writes the
+JSON run report, failures included, to data/reports (PAPERS_REPORT_DIR overrides it; see
+common.instrument). Progress and failures go to the logging module.
+Run from paper_backend with `python -m common.runner [names...]`; --headless (or PAPERS_HEADLESS=1)
+writes signals and JSON only and never imports matplotlib.
+"""
+import argparse
+import contextvars
+import logging
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+
+from .analytics import performance_report, write_report
+from .charts import headless, render_master_charts
+from .executor import default_workers, map_tickers
+from .instrument import count, observe, span, write_run_report
+from .master import build_master, publish_master
+from .materialize import Materializer
+from .price_store import DEFAULT_START, default_store
+from .strategy import REGISTRY, STATIC_DIR, load_papers
+
+MARKET_TICKER = 'SPY'
+
+
+class Node:
+    """
+    One step of the graph. func receives the results of every finished node. A node is skipped
+    when one of requires failed; after only orders it behind other nodes.
+    """
+
+    def __init__(self, func, requires=(), after=()):
+        self.func = func
+        self.requires = tuple(requires)
+        self.after = tuple(after)
+
+
+def run_graph(nodes, workers=None):
+    """
+    Runs {name: Node} in dependency order on a thread pool.
+    Returns (results, errors) where errors maps failed or skipped node names to a reason.
+    """
+    for name, node in nodes.items():
+        unknown = [dep for dep in node.requires + node.after if dep not in nodes]
+        if unknown:
+            raise ValueError(f'{name} depends on unknown nodes: {unknown}')
+
+    results = {}
+    errors = {}
+    pending = dict(nodes)
+    running = {}
+    with ThreadPoolExecutor(max_workers=workers or default_workers()) as pool:
+        while pending or running:
+            scheduled = True
+            while scheduled:
+                scheduled = False
+                for name, node in list(pending.items()):
+                    if any(dep in pending or dep in running.values() for dep in node.requires + node.after):
+                        continue
+                    del pending[name]
+                    scheduled = True
+                    failed = [dep for dep in node.requires if dep in errors]
+                    if failed:
+                        errors[name] = f"skipped because {', '.join(failed)} failed"
+                        count('nodes', node=name, status='skipped')
+                        logging.warning(f"{name}: {errors[name]}")
+                        continue
+                    # Each node runs in a copy of the caller's context so its spans nest under the caller's
+                    context = contextvars.copy_context()
+                    running[pool.submit(context.run, _timed, name, node.func, dict(results))] = name
+            if not running:
+                raise ValueError(f'Dependency cycle between {sorted(pending)}')
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name] = future.result()
+                except Exception:
+                    errors[name] = traceback.format_exc(limit=3)
+                    count('nodes', node=name, status='failed')
+                    logging.error(f"{name}: FAILED\n{errors[name]}")
+                else:
+                    count('nodes', node=name, status='ok')
+    return results, errors
+
+
+def _timed(name, func, results):
+    started = time.perf_counter()
+    with span(name):
+        result = func(results)
+    logging.info(f"{name}: done in {time.perf_counter() - started:.2f}s")
+    return result
+
+
+def _load_history(ticker, start):
+    # Runs in a loader process, so it is timed here and recorded by the parent
+    started = time.perf_counter()
+    history = default_store().history(ticker, start=start)
+    return history, time.perf_counter() - started
+
+
+def load_bars(strategies, extra=(), workers=None):
+    """
+    Loads every ticker the strategies (and extra) read, once each, from the earliest start any
+    of them needs. A strategy whose ticker list cannot be built is left out with a warning.
+    """
+    starts = {ticker: DEFAULT_START for ticker in extra}
+    for name, strategy in strategies.items():
+        try:
+            tickers = strategy.tickers()
+        except Exception as e:
+            logging.warning(f"{name}: could not build its ticker list: {e}")
+            continue
+        for ticker in tickers:
+            starts[ticker] = min(starts.get(ticker, strategy.start), strategy.start)
+
+    bars = {}
+    with span('fetch'):
+        for ticker, loaded, error in map_tickers(_load_history, list(starts), payloads=starts, workers=workers):
+            if error is not None:
+                logging.warning(f"{ticker}: could not load bars: {error}")
+                count('tickers', stage='fetch', status='failed')
+                continue
+            history, seconds = loaded
+            observe('ticker_fetch_seconds', seconds)
+            count('tickers', stage='fetch', status='ok')
+            count('rows', len(history), stage='fetch')
+            if not history.empty:
+                bars[ticker] = history
+    return bars
+
+
+def run_strategies(names=None, master=None, workers=None, base_dir=STATIC_DIR, now=None, report=False, charts=None):
+    """
+    Computes and publishes the named strategies (default: every registered paper). master
+    (default: only when running every paper) adds the consensus, master files and charts;
+    charts=False (default: unless headless) leaves the charts out. report writes the JSON run
+    report, with the graph's errors as its failures, afterwards. Returns (results, errors) of
+    the graph; paper results are StrategyResults.
+    """
+    if names is None or any(name not in REGISTRY for name in names):
+        load_papers()
+    if master is None:
+        master = names is None
+    if charts is None:
+        charts = not headless()
+    names = list(names or REGISTRY)
+    strategies = {name: REGISTRY[name]() for name in names}
+    # One run date for every paper's windows, so all artifacts of the run line up
+    now = now or datetime.now()
+
+    def bars_node(results):
+        return load_bars(strategies, extra=[MARKET_TICKER] if master else (), workers=workers)
+
+    def paper_node(strategy):
+        def run(results):
+            with span('compute'):
+                result = strategy.compute(results['bars'])
+            count('rows', len(result.signals), stage='compute', strategy=strategy.name)
+            with span('write'):
+                strategy.publish(result, base_dir, now=now)
+            return result
+        return run
+
+    nodes = {'bars': Node(bars_node)}
+    for name, strategy in strategies.items():
+        nodes[name] = Node(paper_node(strategy), requires=['bars'])
+
+    if master:
+        def consensus_node(results):
+            # Signals straight from the papers that succeeded, no buy_sell_dicts round-trip
+            signals_by_strategy = {name: results[name].signals for name in names if name in results}
+            if not signals_by_strategy:
+                raise RuntimeError('No strategy produced signals')
+            with span('compute'):
+                return build_master(signals_by_strategy, results['bars'][MARKET_TICKER])
+
+        def master_files_node(results):
+            merged_df, _, master_inflection_points = results['consensus']
+            with span('write'):
+                return publish_master(merged_df, master_inflection_points, base_dir, now=now)
+
+        def master_charts_node(results):
+            # Same run date as the plotly files, so the PNGs cover the same windows
+            merged_df, inflection_points_dict, _ = results['consensus']
+            windows = Materializer('master', base_dir, now=now).date_windows()
+            with span('render'):
+                paths = render_master_charts(merged_df, inflection_points_dict, windows, base_dir)
+            count('charts', len(paths), stage='render')
+            return paths
+
+        def analytics_node(results):
+            signals_by_strategy = {name: results[name].signals for name in names if name in results}
+            with span('compute'):
+                report = performance_report(signals_by_strategy, results['bars'][MARKET_TICKER]['Close'], now=now)
+            with span('write'):
+                return write_report(report, base_dir)
+
+        nodes['consensus'] = Node(consensus_node, requires=['bars'], after=names)
+        nodes['analytics'] = Node(analytics_node, requires=['consensus'])
+        nodes['master_files'] = Node(master_files_node, requires=['consensus'])
+        if charts:
+            nodes['master_charts'] = Node(master_charts_node, requires=['consensus'])
+
+    with span('run'):
+        outcome = run_graph(nodes, workers=workers)
+    if report:
+        write_run_report(failures=outcome[1])
+    return outcome
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the papers and the master consensus in one process.')
+    parser.add_argument('names', nargs='*', help='strategies to run (default: all, plus the master)')
+    parser.add_argument('--workers', type=int, default=None, help='parallel nodes and loader processes')
+    parser.add_argument('--headless', action='store_true', help='write signals and JSON only, render no charts')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    # Every failure was logged as it happened and is in the run report
+    _, errors = run_strategies(args.names or None, workers=args.workers, report=True,
+                               charts=False if args.headless else None)
+    raise SystemExit(1 if errors else 0)
+
+
+if __name__ == '__main__':
+    main()
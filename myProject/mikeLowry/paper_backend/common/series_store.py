@@ -0,0 +1,136 @@
+"""
+Full-history chart series on disk.
+
+Each series is a directory of .npy column files (date as datetime64[D] plus one float64 file
+per column, and optionally the day's int8 signal code) and a series.json manifest holding the
+column names and the inflection points.
+Readers memory-map the columns, so slicing a date range is two binary searches and only the
+touched pages are read.
+"""
+import json
+import os
+import re
+import threading
+
+import numpy as np
+
+from .atomic import atomic_open
+from .downsample import downsample_indices
+from .instrument import count
+
+SERIES_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'series'))
+MANIFEST = 'series.json'
+NAME_PATTERN = re.compile(r'^[A-Za-z0-9_-]+$')
+
+
+def series_dir(name, directory=None):
+    if not NAME_PATTERN.match(name):
+        raise ValueError(f'Invalid series name: {name!r}')
+    return os.path.join(directory or os.environ.get('PAPERS_SERIES_DIR', SERIES_DIR), name)
+
+
+def write_series(name, dates, columns, inflection_points, directory=None, signals=None):
+    """
+    Writes the full history of one chart series. columns maps payload keys such as 'close' to
+    arrays aligned with dates, and signals optionally holds each date's int8 signal code.
+    The manifest is replaced last, after every column is in place.
+    """
+    path = series_dir(name, directory)
+    os.makedirs(path, exist_ok=True)
+    arrays = {'date': np.asarray(dates, dtype='datetime64[D]')}
+    arrays.update({key: np.asarray(values, dtype='float64') for key, values in columns.items()})
+    if signals is not None:
+        arrays['signal'] = np.asarray(signals, dtype=np.int8)
+    for key, array in arrays.items():
+        with atomic_open(os.path.join(path, f'{key}.npy'), 'wb') as handle:
+            np.save(handle, array)
+    count('bytes', sum(array.nbytes for array in arrays.values()), stage='write', kind='series', prefix=name)
+    manifest = {
+        'columns': list(columns),
+        'signals': signals is not None,
+        'inflection_points': [{'date': date, 'signal': signal} for date, signal in inflection_points],
+    }
+    with atomic_open(os.path.join(path, MANIFEST)) as json_file:
+        json.dump(manifest, json_file)
+
+
+class Series:
+    """Memory-mapped columns of one series, sliced by date with binary search."""
+
+    def __init__(self, dates, columns, inflection_points, signals=None):
+        self.dates = dates
+        self.columns = columns
+        self.inflection_points = inflection_points
+        self.signals = signals
+        self._transition_dates = np.array([point['date'] for point in inflection_points], dtype='datetime64[D]')
+
+    @classmethod
+    def load(cls, path):
+        with open(os.path.join(path, MANIFEST)) as json_file:
+            manifest = json.load(json_file)
+        dates = np.load(os.path.join(path, 'date.npy'), mmap_mode='r')
+        columns = {key: np.load(os.path.join(path, f'{key}.npy'), mmap_mode='r') for key in manifest['columns']}
+        signals = np.load(os.path.join(path, 'signal.npy'), mmap_mode='r') if manifest.get('signals') else None
+        return cls(dates, columns, manifest['inflection_points'], signals)
+
+    def bounds(self, start=None, end=None):
+        """Positions [lo, hi) of the bars dated within [start, end], both inclusive and optional."""
+        lo = 0 if start is None else int(np.searchsorted(self.dates, np.datetime64(start, 'D'), side='left'))
+        hi = len(self.dates) if end is None else int(np.searchsorted(self.dates, np.datetime64(end, 'D'), side='right'))
+        return lo, max(lo, hi)
+
+    def transitions_between(self, lo, hi):
+        """Inflection points dated within bars [lo, hi) and their positions relative to lo."""
+        if hi <= lo:
+            return [], np.array([], dtype=np.int64)
+        first = int(np.searchsorted(self._transition_dates, self.dates[lo], side='left'))
+        last = int(np.searchsorted(self._transition_dates, self.dates[hi - 1], side='right'))
+        window = self.dates[lo:hi]
+        wanted = self._transition_dates[first:last]
+        positions = np.minimum(np.searchsorted(window, wanted), len(window) - 1)
+        # Drop transitions that fall on dates without a bar
+        on_bar = window[positions] == wanted
+        points = [point for point, keep in zip(self.inflection_points[first:last], on_bar) if keep]
+        return points, positions[on_bar]
+
+    def window(self, start=None, end=None, max_points=None):
+        """
+        Bars dated within [start, end] reduced to about max_points with LTTB on the first column,
+        always keeping the bars the inflection points sit on.
+        Returns (dates, {key: values}, inflection points, bars in the window before reduction).
+        """
+        lo, hi = self.bounds(start, end)
+        points, keep = self.transitions_between(lo, hi)
+        dates = self.dates[lo:hi]
+        columns = {key: values[lo:hi] for key, values in self.columns.items()}
+        if max_points is not None and hi - lo > max_points:
+            primary = next(iter(columns.values()))
+            indices = downsample_indices(dates.astype(np.int64), primary, max_points, keep)
+            dates = dates[indices]
+            columns = {key: values[indices] for key, values in columns.items()}
+        return np.asarray(dates), {key: np.asarray(values) for key, values in columns.items()}, points, hi - lo
+
+
+class SeriesCache:
+    """Loaded series keyed by name, reloaded when the manifest is replaced."""
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        """Returns the Series called name, or None if it has not been written."""
+        path = series_dir(name, self.directory)
+        try:
+            stamp = os.stat(os.path.join(path, MANIFEST)).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            cached = self._entries.get(name)
+            if cached is not None and cached[0] == stamp:
+                return cached[1]
+        series = Series.load(path)
+        with self._lock:
+            self._entries[name] = (stamp, series)
+        return series
@@ -0,0 +1,97 @@
+import os
+
+import numpy as np
+
+from .signal_store import BUY_SELL_DIR, MISSING, SIGNAL_NAMES, encode_signals, load_all_signals, load_signals
+
+
+def to_day(date):
+    """Converts a date, datetime, Timestamp or date string to numpy datetime64[D]."""
+    return np.datetime64(str(date)[:10], 'D')
+
+
+class SignalIndex:
+    """
+    Point-in-time lookups over one strategy's signal series.
+
+    Dates are held as a sorted datetime64[D] array next to int8 codes, so an as-of query is a
+    binary search rather than a scan over every earlier date.
+    """
+
+    def __init__(self, dates, codes):
+        self.dates = dates
+        self.codes = codes
+
+    @classmethod
+    def from_dict(cls, signals):
+        return cls(*encode_signals(signals))
+
+    @classmethod
+    def from_file(cls, path):
+        return cls.from_dict(load_signals(path))
+
+    def __len__(self):
+        return len(self.dates)
+
+    def _position(self, dates):
+        # Index of the last entry on or before each date; -1 if the date precedes the series
+        return np.searchsorted(self.dates, dates, side='right') - 1
+
+    def asof(self, date):
+        """Returns (effective date, 'Buy'/'Sell') in force on date, or (None, None) before the first entry."""
+        position = self._position(to_day(date))
+        if position < 0:
+            return None, None
+        return str(self.dates[position]), SIGNAL_NAMES.get(int(self.codes[position]))
+
+    def asof_many(self, dates):
+        """Vectorized as-of lookup: returns int8 codes for an array of dates, MISSING before the first entry."""
+        positions = self._position(np.asarray(dates, dtype='datetime64[D]'))
+        codes = self.codes[np.maximum(positions, 0)]
+        return np.where(positions >= 0, codes, MISSING).astype(np.int8)
+
+    def range(self, start=None, end=None):
+        """Returns the (dates, codes) entries with start <= date <= end."""
+        first = 0 if start is None else np.searchsorted(self.dates, to_day(start), side='left')
+        last = len(self.dates) if end is None else np.searchsorted(self.dates, to_day(end), side='right')
+        return self.dates[first:last], self.codes[first:last]
+
+
+class SignalBook:
+    """As-of indexes over every buy_sell_dicts series, keyed by strategy name."""
+
+    def __init__(self, indexes):
+        self.indexes = indexes
+
+    @classmethod
+    def load(cls, directory=BUY_SELL_DIR):
+        return cls({name: SignalIndex.from_dict(signals) for name, signals in load_all_signals(directory).items()})
+
+    def snapshot(self, date):
+        """What every strategy was saying on date: {name: {'date': effective date, 'signal': signal}}."""
+        snapshot = {}
+        for name, index in self.indexes.items():
+            effective, signal = index.asof(date)
+            snapshot[name] = {'date': effective, 'signal': signal}
+        return snapshot
+
+    def snapshot_many(self, dates):
+        """Vectorized snapshots: {name: int8 codes aligned with dates}."""
+        dates = np.asarray(dates, dtype='datetime64[D]')
+        return {name: index.asof_many(dates) for name, index in self.indexes.items()}
+
+
+_cached_book = {'key': None, 'book': None}
+
+
+def current_book(directory=BUY_SELL_DIR):
+    """Returns a SignalBook over directory, reloading it only when a file has changed."""
+    key = tuple(
+        (entry.name, entry.stat().st_mtime_ns, entry.stat().st_size)
+        for entry in sorted(os.scandir(directory), key=lambda entry: entry.name)
+        if entry.name.endswith('.json')
+    )
+    if _cached_book['key'] != key:
+        _cached_book['book'] = SignalBook.load(directory)
+        _cached_book['key'] = key
+    return _cached_book['book']
@@ -0,0 +1,104 @@
+import json
+import os
+import re
+
+import numpy as np
+
+from .instrument import count
+
+BUY_SELL_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'papers', 'buy_sell_dicts'))
+# The last "date": "signal" pair before the closing brace
+LAST_ENTRY = re.compile(rb'"([^"]+)"\s*:\s*"[^"]*"$')
+
+
+def signals_path(name):
+    """Returns the buy_sell_dicts path for a strategy name such as '2023_canary'."""
+    return os.path.join(BUY_SELL_DIR, f'{name}.json')
+
+
+def load_signals(path):
+    """Loads a {date: 'Buy'/'Sell'} dict, or an empty dict if the file does not exist."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as json_file:
+        return json.load(json_file)
+
+
+def write_signals(path, signals):
+    """Writes a full {date: signal} dict in the same layout the papers have always used."""
+    with open(path, 'w') as json_file:
+        json.dump(signals, json_file, indent=4)
+        count('bytes', json_file.tell(), stage='write', kind='signals')
+
+
+def append_signals(path, items):
+    """
+    Appends (date, signal) pairs to an existing buy_sell_dicts file without re-reading it.
+
+    Only the closing brace is rewritten, so the cost is proportional to the number of new
+    entries rather than the length of the history. Pairs at or before the file's last date are
+    dropped, so appending after a full rewrite never duplicates a key.
+    """
+    if not items:
+        return
+    if not os.path.exists(path):
+        write_signals(path, dict(items))
+        return
+    with open(path, 'rb+') as json_file:
+        json_file.seek(0, os.SEEK_END)
+        size = json_file.tell()
+        tail_start = max(0, size - 64)
+        json_file.seek(tail_start)
+        tail = json_file.read()
+        head = tail[:tail.rfind(b'}')].rstrip()
+        last_entry = LAST_ENTRY.search(head)
+        if last_entry is not None:
+            # Keys are ISO dates, so string order is date order
+            last_date = last_entry.group(1).decode('utf-8')
+            items = [(date, signal) for date, signal in items if str(date) > last_date]
+            if not items:
+                return
+        body = ',\n'.join(f'    {json.dumps(date)}: {json.dumps(signal)}' for date, signal in items)
+        separator = b'\n' if head.endswith(b'{') else b',\n'
+        json_file.seek(tail_start + len(head))
+        json_file.truncate()
+        json_file.write(separator + body.encode('utf-8') + b'\n}')
+
+
+# int8 codes used wherever signal series are held as arrays
+SELL = 0
+BUY = 1
+MISSING = -1
+SIGNAL_CODES = {'Sell': SELL, 'Buy': BUY}
+SIGNAL_NAMES = {SELL: 'Sell', BUY: 'Buy'}
+
+
+def encode_signals(signals):
+    """
+    Turns a {date: 'Buy'/'Sell'} dict into sorted datetime64[D] dates and int8 codes.
+    Keys may be 'YYYY-MM-DD' strings, 'YYYY-MM-DD HH:MM:SS' strings or timestamps.
+    """
+    dates = np.array([str(date)[:10] for date in signals], dtype='datetime64[D]')
+    codes = np.array([SIGNAL_CODES.get(signal, MISSING) for signal in signals.values()], dtype=np.int8)
+    order = np.argsort(dates, kind='stable')
+    return dates[order], codes[order]
+
+
+def align_codes(dates, codes, calendar):
+    """Codes of encoded signals on each calendar date (datetime64[D]), MISSING where there is none."""
+    calendar = np.asarray(calendar, dtype='datetime64[D]')
+    aligned = np.full(len(calendar), MISSING, dtype=np.int8)
+    if len(dates) == 0:
+        return aligned
+    positions = np.minimum(np.searchsorted(dates, calendar), len(dates) - 1)
+    matched = dates[positions] == calendar
+    aligned[matched] = codes[positions[matched]]
+    return aligned
+
+
+def load_all_signals(directory=BUY_SELL_DIR):
+    """Loads every buy_sell_dicts file as {strategy name: {date: signal}}, in filename order."""
+    return {
+        filename[:-len('.json')]: load_signals(os.path.join(directory, filename))
+        for filename in sorted(os.listdir(directory)) if filename.endswith('.json')
+    }
@@ -0,0 +1,165 @@
+"""
+Papers as strategy plugins.
+
+A Strategy declares the tickers it reads, computes its signals from bars it is handed and
+publishes them. Paper modules register their strategy with @register and do no work on import,
+so common/runner.py can load every paper into one process and feed them shared data.
+"""
+import importlib.util
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from .instrument import span
+from .materialize import Materializer
+from .price_store import DEFAULT_START
+from .series_store import write_series
+from .signal_store import BUY, SELL, align_codes, encode_signals, signals_path, write_signals
+from .transitions import transitions_from_signals
+
+PAPERS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'papers'))
+STATIC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'static'))
+# Paper modules holding registered strategies (2020_quantamentals is a backtest, not a signal)
+PAPER_FILES = ['2014_utilities.py', '2016_leveraged_etf.py', '2023_5_percent_canary.py', '2024_ripple.py']
+
+REGISTRY = {}
+
+
+def register(cls):
+    """Class decorator adding a Strategy subclass to the registry under its name."""
+    REGISTRY[cls.name] = cls
+    return cls
+
+
+class StrategyResult:
+    """
+    Output of one compute: signals as {'YYYY-MM-DD': 'Buy'/'Sell'}, plus the frame the charts
+    are drawn from and the {payload key: frame column} mapping to chart (both optional).
+    """
+
+    def __init__(self, signals, frame=None, columns=None):
+        self.signals = signals
+        self.frame = frame
+        self.columns = columns
+
+
+class Strategy:
+    """
+    Base class for a paper. name is the strategy's buy_sell_dicts and consensus key; plot_prefix
+    names its plotly files and is None for papers without charts.
+    """
+
+    name = None
+    plot_prefix = None
+    start = DEFAULT_START
+    # Tunable parameters and their defaults; the constructor accepts overrides by keyword
+    params = {}
+
+    def __init__(self, **params):
+        unknown = set(params) - set(self.params)
+        if unknown:
+            raise TypeError(f"{type(self).__name__} has no parameters {sorted(unknown)}")
+        for key, default in self.params.items():
+            setattr(self, key, params.get(key, default))
+
+    def tickers(self):
+        """Tickers whose daily bars compute() reads, loaded from start on."""
+        return []
+
+    def compute(self, bars):
+        """Returns a StrategyResult from {ticker: bar frame}. Must not write anything."""
+        raise NotImplementedError
+
+    def sweep_inputs(self, bars):
+        """
+        Inputs shared by every point of a parameter sweep, computed once. Subclasses return
+        precomputed arrays here so sweep_codes stays cheap; the default keeps the raw bars.
+        """
+        return {'bars': bars}
+
+    def sweep_codes(self, inputs, cache, **params):
+        """
+        (dates, int8 codes) of the signal under params. cache is a per-process dict for
+        intermediate results shared between grid points. The default runs compute() in full.
+        """
+        return encode_signals(type(self)(**params).compute(inputs['bars']).signals)
+
+    def publish(self, result, base_dir=STATIC_DIR, now=None):
+        """Writes the buy_sell_dicts file and, for charted papers, the series and plotly files."""
+        with span('signals'):
+            write_signals(signals_path(self.name), result.signals)
+        if self.plot_prefix is None or result.frame is None:
+            return
+        inflection_points = transitions_from_signals(result.signals).points()
+        frame = result.frame
+        # Full history for the range endpoint, which slices and downsamples it per request
+        with span('series'):
+            write_series(self.plot_prefix, frame.index,
+                         {key: frame[column].to_numpy() for key, column in result.columns.items()},
+                         inflection_points, signals=align_codes(*encode_signals(result.signals), frame.index.values))
+        # Cut every timeframe against one run date and publish the files as a single generation
+        with span('plotly'):
+            Materializer(self.plot_prefix, base_dir, now=now).write(frame, result.columns, inflection_points)
+
+
+class RelativeStrengthStrategy(Strategy):
+    """
+    Buy while an asset loses relative strength against the market: the weekly ratio of their
+    closes fell over the last lookback weeks. Subclasses set asset_ticker and asset_label, the
+    suffix of the asset's close column in the chart frame.
+    """
+
+    asset_ticker = None
+    asset_label = None
+    market_ticker = 'SPY'
+    params = {'lookback': 4}
+
+    def tickers(self):
+        return [self.asset_ticker, self.market_ticker]
+
+    def _closes(self, bars):
+        return pd.merge(bars[self.asset_ticker]['Close'], bars[self.market_ticker]['Close'], left_index=True,
+                        right_index=True, suffixes=(f'_{self.asset_label}', '_Market'))
+
+    def compute(self, bars):
+        df = self._closes(bars)
+        weekly_df = df.resample('W').last()
+        weekly_df['Relative_Strength'] = weekly_df[f'Close_{self.asset_label}'] / weekly_df['Close_Market']
+        weekly_df['Rolling_RS'] = weekly_df['Relative_Strength'].pct_change(periods=self.lookback)
+        weekly_df['Signal'] = np.where(weekly_df['Rolling_RS'] < 0, 'Buy', 'Sell')
+        df['Weekly_Signal'] = weekly_df['Signal'].reindex(df.index, method='ffill')
+        df.index = pd.to_datetime(df.index).normalize()
+        daily_signals = df[df['Weekly_Signal'].isin(['Buy', 'Sell'])]
+        signals_dict = {date.strftime('%Y-%m-%d'): signal for date, signal in daily_signals['Weekly_Signal'].items()}
+
+        return StrategyResult(signals_dict, df, {'close': 'Close_Market'})
+
+    def sweep_inputs(self, bars):
+        # The weekly ratio does not depend on the lookback, so it is resampled once per sweep
+        df = self._closes(bars)
+        weekly_df = df.resample('W').last()
+        relative_strength = weekly_df[f'Close_{self.asset_label}'] / weekly_df['Close_Market']
+        # Weekly row each day forward-fills from, as reindex(method='ffill') picks it
+        positions = weekly_df.index.searchsorted(df.index, side='right') - 1
+        dates = df.index.normalize().to_numpy().astype('datetime64[D]')
+        return {'relative_strength': relative_strength, 'positions': positions[positions >= 0], 'dates': dates[positions >= 0]}
+
+    def sweep_codes(self, inputs, cache, lookback=4):
+        rolling_rs = inputs['relative_strength'].pct_change(periods=lookback).to_numpy()
+        weekly_codes = np.where(rolling_rs < 0, BUY, SELL).astype(np.int8)
+        return inputs['dates'], weekly_codes[inputs['positions']]
+
+
+def load_papers(files=PAPER_FILES):
+    """Imports the paper modules so their strategies register. Returns the registry."""
+    for filename in files:
+        module_name = f'paper_{os.path.splitext(filename)[0]}'
+        if module_name in sys.modules:
+            continue
+        spec = importlib.util.spec_from_file_location(module_name, os.path.join(PAPERS_DIR, filename))
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[module_name] = module
+        spec.loader.exec_module(module)
+    return REGISTRY
@@ -0,0 +1,152 @@
+"""
+Streaming signal evaluation.
+
+A feed yields bars one timestamp at a time as (timestamp, {ticker: close}); the engine hands each
+bar to every strategy's incremental state (running sums, monotonic deques) and reports a Buy/Sell
+transition as soon as a state's signal changes. Timestamps are 'YYYY-MM-DD' for daily bars or
+'YYYY-MM-DD HH:MM[:SS]' for intraday ones. ReplayFeed plays a local CSV back for testing. Run from
+paper_backend with `python -m common.stream replay.csv [names...]`, or write a replay file from
+the price store with `--export`.
+"""
+import argparse
+import csv
+import time
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from .incremental import STRATEGIES
+from .price_store import DEFAULT_START, default_store
+
+REPLAY_COLUMNS = ['timestamp', 'ticker', 'close']
+
+Transition = namedtuple('Transition', ['name', 'timestamp', 'signal', 'previous'])
+
+
+class ReplayFeed:
+    """
+    Replays a long-format CSV (timestamp,ticker,close, sorted by timestamp) bar by bar. Rows are
+    read lazily, so a replay of any length holds one bar in memory. speed > 0 sleeps between
+    bars to play them back that many times faster than real time.
+    """
+
+    def __init__(self, path, speed=None):
+        self.path = path
+        self.speed = speed
+
+    def __iter__(self):
+        with open(self.path, newline='') as csv_file:
+            reader = csv.DictReader(csv_file)
+            timestamp = None
+            closes = {}
+            previous_time = None
+            for row in reader:
+                if row['timestamp'] != timestamp:
+                    if timestamp is not None:
+                        previous_time = self._pace(timestamp, previous_time)
+                        yield timestamp, closes
+                    timestamp = row['timestamp']
+                    closes = {}
+                closes[row['ticker']] = float(row['close'])
+            if timestamp is not None:
+                self._pace(timestamp, previous_time)
+                yield timestamp, closes
+
+    def _pace(self, timestamp, previous_time):
+        current = pd.Timestamp(timestamp)
+        if self.speed and previous_time is not None:
+            time.sleep(max(0.0, (current - previous_time).total_seconds() / self.speed))
+        return current
+
+
+def write_replay(path, closes):
+    """Writes a (timestamp x ticker) close frame as a replay CSV, skipping missing closes."""
+    stacked = closes.sort_index().stack().reset_index()
+    stacked.columns = REPLAY_COLUMNS
+    stacked = stacked.dropna(subset=['close'])
+    daily = (closes.index == closes.index.normalize()).all()
+    stacked['timestamp'] = stacked['timestamp'].dt.strftime('%Y-%m-%d' if daily else '%Y-%m-%d %H:%M:%S')
+    stacked.to_csv(path, index=False)
+    return len(stacked)
+
+
+class StreamEngine:
+    """
+    Runs incremental strategy states over a bar stream. states maps names to state objects
+    (see common.incremental); on_transition(Transition) is called the moment a state's signal
+    changes. Per-bar processing times are kept for latency stats.
+    """
+
+    def __init__(self, states, on_transition=None):
+        self.states = states
+        self.on_transition = on_transition
+        self.signals = {name: None for name in states}
+        self.latencies = []
+
+    @classmethod
+    def from_names(cls, names=None, on_transition=None):
+        """Fresh states for the named strategies of common.incremental (default: all)."""
+        return cls({name: STRATEGIES[name][1]() for name in names or STRATEGIES}, on_transition)
+
+    def on_bar(self, timestamp, closes):
+        """Feeds one bar ({ticker: close}) to every state; returns the transitions it caused."""
+        started = time.perf_counter()
+        transitions = []
+        for name, state in self.states.items():
+            row = [closes.get(ticker, np.nan) for ticker in state.tickers]
+            # Inner-joined states only see bars where all their tickers traded, as in batch
+            if state.join == 'inner' and any(value != value for value in row):
+                continue
+            if state.join == 'outer' and all(value != value for value in row):
+                continue
+            for day, signal in state.update(timestamp, np.array(row)):
+                previous = self.signals[name]
+                self.signals[name] = signal
+                if signal != previous:
+                    transition = Transition(name, day, signal, previous)
+                    transitions.append(transition)
+                    if self.on_transition is not None:
+                        self.on_transition(transition)
+        self.latencies.append(time.perf_counter() - started)
+        return transitions
+
+    def run(self, feed):
+        """Consumes a whole feed; returns every transition in order."""
+        transitions = []
+        for timestamp, closes in feed:
+            transitions.extend(self.on_bar(timestamp, closes))
+        return transitions
+
+    def latency(self):
+        """Per-bar processing time in microseconds: bars, mean, p50, p99 and max."""
+        if not self.latencies:
+            return {'bars': 0}
+        micros = np.array(self.latencies) * 1e6
+        return {'bars': len(micros), 'mean': float(micros.mean()), 'p50': float(np.percentile(micros, 50)),
+                'p99': float(np.percentile(micros, 99)), 'max': float(micros.max())}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay bars through the incremental strategies.')
+    parser.add_argument('path', help='replay CSV (timestamp,ticker,close)')
+    parser.add_argument('names', nargs='*', help=f"strategies (default: {', '.join(STRATEGIES)})")
+    parser.add_argument('--speed', type=float, default=None, help='play back this many times faster than real time')
+    parser.add_argument('--export', action='store_true', help="write the strategies' tickers from the price store to path")
+    parser.add_argument('--start', default=DEFAULT_START, help='first day to export')
+    args = parser.parse_args()
+
+    engine = StreamEngine.from_names(args.names or None, on_transition=lambda t: print(
+        f"{t.timestamp} {t.name}: {t.previous or '-'} -> {t.signal}"))
+    if args.export:
+        store = default_store()
+        tickers = sorted({ticker for state in engine.states.values() for ticker in state.tickers})
+        closes = pd.concat({ticker: store.closes(ticker, start=args.start) for ticker in tickers}, axis=1)
+        print(f"{write_replay(args.path, closes)} bars written to {args.path}")
+        return
+    engine.run(ReplayFeed(args.path, speed=args.speed))
+    print(engine.latency())
+
+
+if __name__ == '__main__':
+    main()
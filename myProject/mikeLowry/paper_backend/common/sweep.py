@@ -0,0 +1,168 @@
+"""
+Parameter sweeps over a paper's signal thresholds.
+
+Bars are loaded once and turned into the strategy's sweep_inputs once; every worker process
+receives them a single time through the pool initializer and keeps a cache of intermediate
+results (rolling sums, low percentages, ...) shared by the grid points it evaluates. Grid points
+are sent in chunks in grid order, so points sharing an expensive parameter land on the same
+worker. Each point is scored by holding SPY while the signal says Buy. Run from paper_backend
+with `python -m common.sweep 2023_canary window=3,5,10 threshold=-0.10:-0.01:0.01`.
+"""
+import argparse
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from .analytics import return_metrics
+from .executor import default_workers
+from .signal_store import BUY
+from .strategy import REGISTRY, load_papers
+
+SWEEPS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'sweeps'))
+MARKET_TICKER = 'SPY'
+STAT_COLUMNS = ['signals', 'buy_share', 'transitions', 'mean_dwell', 'exposure',
+                'total_return', 'cagr', 'volatility', 'sharpe', 'max_drawdown']
+
+
+def _parse_value(text):
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+def parse_axis(spec):
+    """
+    Parses 'key=v1,v2,...' or 'key=start:stop:step' (stop included) into (key, values).
+    Values are ints when every bound is an int and floats otherwise.
+    """
+    key, sep, values = spec.partition('=')
+    if not sep or not key or not values:
+        raise ValueError(f"Expected key=values, got {spec!r}")
+    if ':' in values:
+        start, stop, step = (_parse_value(part) for part in values.split(':'))
+        if step == 0 or (stop - start) * step < 0:
+            raise ValueError(f"Empty range in {spec!r}")
+        count = int(round((stop - start) / step)) + 1
+        points = [start + i * step for i in range(count)]
+        if not all(isinstance(bound, int) for bound in (start, stop, step)):
+            # Round away the float drift of start + i * step
+            points = [round(point, 10) for point in points]
+        return key, points
+    return key, [_parse_value(value) for value in values.split(',')]
+
+
+def expand_grid(axes):
+    """Every combination of [(key, values), ...] as a list of dicts, first axis varying slowest."""
+    keys = [key for key, _ in axes]
+    return [dict(zip(keys, combo)) for combo in itertools.product(*(values for _, values in axes))]
+
+
+def signal_stats(dates, codes, market_dates, market_returns):
+    """
+    Scores one signal against the market. The position held over the return from day t to t+1
+    is the code at t (1 for Buy, 0 for Sell or no signal), within the span the signal covers.
+    market_returns[i] is the return from market_dates[i - 1] to market_dates[i].
+    """
+    stats = dict.fromkeys(STAT_COLUMNS, np.nan)
+    stats['signals'] = len(codes)
+    if len(codes) == 0:
+        return stats
+    buys = codes == BUY
+    transitions = int(np.count_nonzero(codes[1:] != codes[:-1]))
+    stats.update(buy_share=buys.mean(), transitions=transitions, mean_dwell=len(codes) / (transitions + 1))
+
+    # Positions on the market calendar, from the first to the last signal date
+    first, last = np.searchsorted(market_dates, [dates[0], dates[-1]])
+    last = min(last, len(market_dates) - 1)
+    if last <= first:
+        return stats
+    positions = np.zeros(last - first + 1)
+    positions_at = np.searchsorted(market_dates, dates)
+    matched = (positions_at <= last) & (market_dates[np.minimum(positions_at, last)] == dates)
+    positions[positions_at[matched] - first] = buys[matched]
+    returns = positions[:-1] * market_returns[first + 1:last + 1]
+
+    # The same kernel as the analytics report, on a single always-active row
+    metrics = return_metrics(returns[None, :], np.ones((1, len(returns)), dtype=bool))
+    stats.update({metric: float(metrics[metric][0]) for metric in ['total_return', 'cagr', 'volatility', 'sharpe', 'max_drawdown']})
+    stats['exposure'] = positions[:-1].mean()
+    return stats
+
+
+# Per-worker state, set once by the pool initializer
+_worker = {}
+
+
+def _init_worker(name, inputs, market_dates, market_returns):
+    if name not in REGISTRY:
+        load_papers()
+    _worker.update(strategy=REGISTRY[name](), inputs=inputs, market_dates=market_dates,
+                   market_returns=market_returns, cache={})
+
+
+def _evaluate(params):
+    dates, codes = _worker['strategy'].sweep_codes(_worker['inputs'], _worker['cache'], **params)
+    return {**params, **signal_stats(dates, codes, _worker['market_dates'], _worker['market_returns'])}
+
+
+def run_sweep(name, grid, bars, workers=None, chunksize=None):
+    """
+    Evaluates every params dict of grid for the named strategy over bars ({ticker: bar frame},
+    which must include SPY). Returns a DataFrame with one row per grid point, in grid order.
+    """
+    if name not in REGISTRY:
+        load_papers()
+    strategy = REGISTRY[name]()
+    for params in grid:
+        # Fail before starting workers if a key is not one of the strategy's parameters
+        type(strategy)(**params)
+    inputs = strategy.sweep_inputs(bars)
+    close = bars[MARKET_TICKER]['Close']
+    market_dates = close.index.normalize().to_numpy().astype('datetime64[D]')
+    market_returns = np.concatenate([[0.0], close.to_numpy()[1:] / close.to_numpy()[:-1] - 1])
+    initargs = (name, inputs, market_dates, market_returns)
+
+    workers = min(workers or default_workers(), len(grid)) or 1
+    if workers == 1:
+        _init_worker(*initargs)
+        rows = [_evaluate(params) for params in grid]
+    else:
+        if chunksize is None:
+            chunksize = max(1, len(grid) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs) as pool:
+            rows = list(pool.map(_evaluate, grid, chunksize=chunksize))
+    return pd.DataFrame(rows, columns=[*grid[0], *STAT_COLUMNS] if grid else STAT_COLUMNS)
+
+
+def main():
+    from .runner import load_bars
+
+    parser = argparse.ArgumentParser(description="Sweep a paper's parameters and score each signal against SPY.")
+    parser.add_argument('name', help='strategy to sweep, e.g. 2023_canary')
+    parser.add_argument('axes', nargs='+', help='key=v1,v2,... or key=start:stop:step')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes')
+    parser.add_argument('--output', default=None, help=f'CSV path (default: {SWEEPS_DIR}/<name>_<time>.csv)')
+    parser.add_argument('--sort', default='sharpe', help='column to print the top rows by')
+    args = parser.parse_args()
+
+    load_papers()
+    if args.name not in REGISTRY:
+        parser.error(f"Unknown strategy {args.name!r}; choose from {', '.join(REGISTRY)}")
+    grid = expand_grid([parse_axis(spec) for spec in args.axes])
+    bars = load_bars({args.name: REGISTRY[args.name]()}, extra=[MARKET_TICKER], workers=args.workers)
+    results = run_sweep(args.name, grid, bars, workers=args.workers)
+
+    output = args.output or os.path.join(SWEEPS_DIR, f"{args.name}_{datetime.now():%Y%m%d_%H%M%S}.csv")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    results.to_csv(output, index=False)
+    print(results.sort_values(args.sort, ascending=False).head(10).to_string(index=False))
+    print(f"{len(results)} points written to {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+Seeded synthetic markets for benchmarks and offline runs.
+
+Returns follow a one-factor model with sector factors on top of a Markov regime chain (calm
+bull, choppy bear, short crises), so tickers are correlated, volatility clusters and drawdowns
+happen at roughly realistic rates. SPY is the market factor itself, XLU a low-beta defensive
+and SPXL the 3x daily leveraged SPY, which covers every ticker the papers read besides the
+universe. Closes are generated per chunk of tickers into one float32 (days x tickers) panel;
+OHLCV bars are derived from them on request, deterministically per ticker.
+"""
+import numpy as np
+import pandas as pd
+
+from .price_store import BAR_COLUMNS
+
+TRADING_DAYS = 252
+MARKET_TICKERS = ['SPY', 'XLU', 'SPXL']
+SECTORS = 11
+# (daily drift, daily volatility) per regime and the chance of moving to each regime next day
+REGIMES = {
+    'bull': (0.0007, 0.008),
+    'bear': (-0.0003, 0.015),
+    'crisis': (-0.0020, 0.035),
+}
+TRANSITIONS = np.array([
+    [0.9960, 0.0035, 0.0005],
+    [0.0120, 0.9850, 0.0030],
+    [0.0300, 0.0200, 0.9500],
+])
+CHUNK = 256
+
+
+def regime_path(days, rng):
+    """Regime index (0 bull, 1 bear, 2 crisis) for every day of a Markov chain starting in a bull market."""
+    draws = rng.random(days)
+    cumulative = np.cumsum(TRANSITIONS, axis=1)
+    path = np.empty(days, dtype=np.int8)
+    state = 0
+    for day in range(days):
+        state = int(np.searchsorted(cumulative[state], draws[day], side='right'))
+        path[day] = state
+    return path
+
+
+def universe_tickers(count):
+    return [f'T{number:04d}' for number in range(count)]
+
+
+class SyntheticMarket:
+    """
+    A generated market: dates, the regime path, and closes for MARKET_TICKERS plus `tickers`
+    universe members. The same seed always produces the same market.
+    """
+
+    def __init__(self, n_tickers=100, years=40, seed=0, start='1985-01-02'):
+        self.seed = seed
+        rng = np.random.default_rng(seed)
+        days = years * TRADING_DAYS
+        self.dates = pd.bdate_range(start, periods=days, name='Date')
+        self.regimes = regime_path(days, rng)
+        drift = np.array([value[0] for value in REGIMES.values()])[self.regimes]
+        volatility = np.array([value[1] for value in REGIMES.values()])[self.regimes]
+
+        market = drift + volatility * rng.standard_normal(days)
+        sectors = volatility[:, None] * 0.6 * rng.standard_normal((days, SECTORS))
+        spy = 100 * np.exp(np.cumsum(market))
+        xlu = 40 * np.exp(np.cumsum(0.0002 + 0.5 * market + 0.006 * rng.standard_normal(days)))
+        # Leveraged ETFs compound three times SPY's simple daily return
+        spxl = 10 * np.cumprod(1 + 3 * np.expm1(market))
+
+        self.tickers = universe_tickers(n_tickers)
+        self.closes = np.empty((days, len(MARKET_TICKERS) + n_tickers), dtype=np.float32)
+        self.closes[:, :len(MARKET_TICKERS)] = np.column_stack([spy, xlu, spxl])
+        betas = rng.uniform(0.4, 1.6, n_tickers)
+        sector_of = rng.integers(0, SECTORS, n_tickers)
+        idiosyncratic = rng.uniform(0.008, 0.025, n_tickers)
+        levels = rng.uniform(10, 300, n_tickers)
+        for first in range(0, n_tickers, CHUNK):
+            last = min(first + CHUNK, n_tickers)
+            noise = rng.standard_normal((days, last - first)) * idiosyncratic[first:last]
+            returns = market[:, None] * betas[first:last] + sectors[:, sector_of[first:last]] + noise
+            self.closes[:, len(MARKET_TICKERS) + first:len(MARKET_TICKERS) + last] = \
+                levels[first:last] * np.exp(np.cumsum(returns, axis=0))
+        self._columns = {ticker: column for column, ticker in enumerate(MARKET_TICKERS + self.tickers)}
+
+    def close(self, ticker):
+        return pd.Series(self.closes[:, self._columns[ticker]].astype('float64'), index=self.dates, name='Close')
+
+    def bars(self, ticker, fields=BAR_COLUMNS):
+        """OHLCV frame for one ticker in the price store's layout, limited to fields."""
+        close = self.closes[:, self._columns[ticker]].astype('float64')
+        rng = np.random.default_rng((self.seed, self._columns[ticker]))
+        columns = {'Close': close}
+        if set(fields) - {'Close'}:
+            previous = np.concatenate([[close[0]], close[:-1]])
+            columns['Open'] = previous * np.exp(0.002 * rng.standard_normal(len(close)))
+            spread = np.abs(0.006 * rng.standard_normal((2, len(close))))
+            columns['High'] = np.maximum(columns['Open'], close) * np.exp(spread[0])
+            columns['Low'] = np.minimum(columns['Open'], close) * np.exp(-spread[1])
+            move = np.abs(np.log(close / previous))
+            columns['Volume'] = np.round(1e6 * np.exp(0.3 * rng.standard_normal(len(close))) * (1 + 50 * move))
+        return pd.DataFrame({field: columns[field] for field in fields}, index=self.dates)
+
+    def bar_dict(self, tickers=None, fields=BAR_COLUMNS):
+        """{ticker: bar frame} for tickers (default: the market tickers and the whole universe)."""
+        return {ticker: self.bars(ticker, fields) for ticker in (tickers or MARKET_TICKERS + self.tickers)}
+
+    def fundamentals(self, tickers=None):
+        """
+        {ticker: metrics} in the layout 2020_quantamentals derives from statements, one constant
+        value per metric and ticker, drawn deterministically per ticker like its bars.
+        """
+        metrics = {}
+        for ticker in (tickers or self.tickers):
+            rng = np.random.default_rng((self.seed, self._columns[ticker], 1))
+            ebit = rng.uniform(1e8, 1e10)
+            metrics[ticker] = {
+                'EBIT': ebit,
+                'EV': ebit * rng.uniform(6, 30),
+                'Price/Sales': rng.uniform(0.5, 8),
+                'ROE': rng.uniform(-0.1, 0.4),
+                'ROIC': rng.uniform(-0.05, 0.3),
+                'Gross Profitability': rng.uniform(0.05, 0.6),
+            }
+        return metrics
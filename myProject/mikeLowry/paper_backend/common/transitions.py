@@ -0,0 +1,59 @@
+import numpy as np
+
+from .signal_store import SIGNAL_NAMES, encode_signals
+
+
+class Transitions:
+    """
+    Run-length view of an encoded signal series: where the signal changes, what it changes to,
+    and how long every run lasts.
+    """
+
+    def __init__(self, dates, codes, run_starts, run_lengths):
+        self.dates = dates
+        self.codes = codes
+        self.run_starts = run_starts
+        self.run_lengths = run_lengths
+
+    @property
+    def indices(self):
+        """Positions where the signal differs from the previous bar (the first bar is not a transition)."""
+        return self.run_starts[1:]
+
+    @property
+    def run_codes(self):
+        return self.codes[self.run_starts]
+
+    def points(self):
+        """Transitions as (date string, 'Buy'/'Sell') pairs, the shape the plotly files use."""
+        return [(str(self.dates[i]), SIGNAL_NAMES.get(int(self.codes[i]))) for i in self.indices]
+
+    def dwell_stats(self):
+        """Number of runs and mean/median/max run length in bars, per signal."""
+        stats = {}
+        run_codes = self.run_codes
+        for code, name in SIGNAL_NAMES.items():
+            lengths = self.run_lengths[run_codes == code]
+            stats[name] = {
+                'runs': int(len(lengths)),
+                'mean': float(lengths.mean()) if len(lengths) else 0.0,
+                'median': float(np.median(lengths)) if len(lengths) else 0.0,
+                'max': int(lengths.max()) if len(lengths) else 0,
+            }
+        return stats
+
+
+def find_transitions(dates, codes):
+    """Finds every signal change in one diff over the code array."""
+    codes = np.asarray(codes)
+    if len(codes) == 0:
+        empty = np.array([], dtype=np.int64)
+        return Transitions(dates, codes, empty, empty)
+    run_starts = np.concatenate(([0], np.flatnonzero(codes[1:] != codes[:-1]) + 1))
+    run_lengths = np.diff(np.append(run_starts, len(codes)))
+    return Transitions(dates, codes, run_starts, run_lengths)
+
+
+def transitions_from_signals(signals):
+    """find_transitions over a {date: 'Buy'/'Sell'} dict, taken in date order."""
+    return find_transitions(*encode_signals(signals))
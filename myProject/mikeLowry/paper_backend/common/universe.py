@@ -0,0 +1,47 @@
+import os
+
+import pandas as pd
+
+from .price_store import default_store
+
+SP500_URL = 'https://en.wikipedia.org/wiki/List_of_S%26P_500_companies'
+NYSE_URL = 'https://raw.githubusercontent.com/rreichel3/US-Stock-Symbols/main/nyse/nyse_tickers.txt'
+
+
+def _fixture_listing(name):
+    # Offline runs (PAPERS_FIXTURE_DIR) take listings from the fixture source, never the network
+    source = default_store().source
+    return source.listing(name) if hasattr(source, 'listing') else None
+
+
+def sp500_tickers():
+    """Fetches the list of S&P 500 tickers from Wikipedia, or sp500.txt in fixture mode."""
+    tickers = _fixture_listing('sp500')
+    if tickers is not None:
+        return tickers
+    sp500_table = pd.read_html(SP500_URL)[0]
+    return sp500_table['Symbol'].tolist()
+
+
+def nyse_tickers():
+    """Fetches the list of NYSE tickers, or nyse.txt in fixture mode."""
+    tickers = _fixture_listing('nyse')
+    if tickers is not None:
+        return tickers
+    tickers_df = pd.read_csv(NYSE_URL, header=None)
+    return tickers_df[0].tolist()
+
+
+UNIVERSES = {'sp500': sp500_tickers, 'nyse': nyse_tickers}
+
+
+def ripple_universe():
+    """
+    Tickers the ripple breadth is measured over: PAPERS_RIPPLE_UNIVERSE names the listing,
+    'sp500' (the default) or 'nyse'. Incremental ripple state keeps the universe it was built
+    with, so switching needs a --rebuild.
+    """
+    name = os.environ.get('PAPERS_RIPPLE_UNIVERSE', 'sp500')
+    if name not in UNIVERSES:
+        raise ValueError(f'Unknown ripple universe: {name!r}')
+    return UNIVERSES[name]()
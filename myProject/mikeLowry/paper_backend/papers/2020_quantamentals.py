@@ -1,179 +1,234 @@
 import pandas as pd
 import numpy as np
-import yfinance as yf
-import backtrader as bt
+import functools
 import logging
+import argparse
+import os
+import sys
 
-# Setting up the logger
-logging.basicConfig(level=logging.INFO)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from common.backtest import rebalance_mask, run_backtest
+from common.factors import FUNDAMENTAL_FACTORS, TECHNICAL_FACTORS, FactorPanel, input_digest
+from common.fundamentals import default_fundamentals_store
+from common.price_store import default_store
+from common.ranking import composite_score, ordinal_rank, top_k_mask
+from common.universe import sp500_tickers
 
 def fetch_sp500_tickers():
-    """Fetches the list of S&P 500 tickers from Wikipedia."""
-    url = 'https://en.wikipedia.org/wiki/List_of_S%26P_500_companies'
-    data = pd.read_html(url)
-    sp500_table = data[0]
-    return sp500_table['Symbol'].tolist()
+    """Fetches the list of S&P 500 tickers from Wikipedia (sp500.txt in fixture mode)."""
+    return sp500_tickers()
 
 def fetch_data(tickers, start, end):
-    """Fetches historical price data from Yahoo Finance for a list of tickers."""
-    data = yf.download(tickers, start=start, end=end, group_by='ticker')
-    print("Data structure:\n", data.head())  # Debug statement to check data structure
+    """Fetches historical price data for a list of tickers from the shared price store."""
+    store = default_store()
+    frames = {}
+    for ticker in tickers:
+        bars = store.history(ticker, start=start, end=end)
+        if not bars.empty:
+            # Store bars are already split/dividend adjusted
+            bars['Adj Close'] = bars['Close']
+            frames[ticker] = bars
+    data = pd.concat(frames, axis=1)
     return data
 
-def fetch_fundamental_data(tickers, data):
-    """Fetches fundamental data for a list of tickers."""
+def fundamental_metrics(fundamentals):
+    """Calculates the fundamental metrics of one ticker from its stored statements, or None if they are not available."""
+    financials = fundamentals.financials
+    balance_sheet = fundamentals.balance_sheet
+    cashflow = fundamentals.cashflow
+
+    # Calculating EV and other metrics
+    if not financials.empty and not balance_sheet.empty and not cashflow.empty:
+        ev = balance_sheet.get('Total Capitalization', np.nan) - balance_sheet.get('Cash And Cash Equivalents', np.nan)
+        ebit_ev = financials.get('EBIT', np.nan) / ev
+        ptos = fundamentals.info.get('priceToSalesTrailing12Months', np.nan)
+
+        # Handling cases where specific metrics might not be available
+        roe = financials.get('Net Income Common Stockholders', np.nan) / balance_sheet.get('Common Stock Equity', np.nan)
+        roic = financials.get('Operating Income', np.nan) / (balance_sheet.get('Common Stock Equity', np.nan) + balance_sheet.get('Total Debt', np.nan))
+        gross_profitability = financials.get('Gross Profit', np.nan) / balance_sheet.get('Total Assets', np.nan)
+
+        return {
+            'EBIT': financials.get('EBIT', np.nan),
+            'EV': ev,
+            'Price/Sales': ptos if ptos is not None else np.nan,
+            'ROE': roe,
+            'ROIC': roic,
+            'Gross Profitability': gross_profitability
+        }
+    logging.warning(f"Missing fundamental data for {fundamentals.ticker}")
+    return None
+
+def fetch_fundamental_data(tickers, data, store=None):
+    """Serves fundamental data for a list of tickers from the local store, fetching only missing or stale tickers."""
+    store = store or default_fundamentals_store()
     fundamental_data = {}
-    for ticker in tickers:
-        ticker_data = yf.Ticker(ticker)
-        print("Ticker data:\n", ticker_data)  # Debug statement to check ticker data structure
-        
-        # Fetching fundamental data
-        try:
-            fundamentals = ticker_data.financials.T
-            balance_sheet = ticker_data.balance_sheet.T
-            cashflow = ticker_data.cashflow.T
-        except AttributeError:
-            # Handle case where financials data is not available
-            continue
-        
-        # Fetching market data
-        try:
-            market_data = ticker_data.history(period='1d', start='2003-09-30', end='2019-09-30')
-        except Exception as e:
-            logging.warning(f"Failed to fetch market data for {ticker}: {str(e)}")
-            continue
-        
-        # Calculating EV and other metrics
-        if not fundamentals.empty and not balance_sheet.empty and not cashflow.empty:
-            ev = balance_sheet.get('Total Capitalization', np.nan) - balance_sheet.get('Cash And Cash Equivalents', np.nan)
-            ebit_ev = fundamentals.get('EBIT', np.nan) / ev
-            ptos = ticker_data.info.get('priceToSalesTrailing12Months', np.nan)
-            
-            # Handling cases where specific metrics might not be available
-            roe = fundamentals.get('Net Income Common Stockholders', np.nan) / balance_sheet.get('Common Stock Equity', np.nan)
-            roic = fundamentals.get('Operating Income', np.nan) / (balance_sheet.get('Common Stock Equity', np.nan) + balance_sheet.get('Total Debt', np.nan))
-            gross_profitability = fundamentals.get('Gross Profit', np.nan) / balance_sheet.get('Total Assets', np.nan)
-            
-            fundamental_data[ticker] = {
-                'EBIT': fundamentals.get('EBIT', np.nan),
-                'EV': ev,
-                'Price/Sales': ptos,
-                'ROE': roe,
-                'ROIC': roic,
-                'Gross Profitability': gross_profitability
-            }
-        else:
-            logging.warning(f"Missing fundamental data for {ticker}")
-    
+    for ticker, fundamentals in store.get_many(tickers).items():
+        metrics = fundamental_metrics(fundamentals)
+        if metrics is not None:
+            fundamental_data[ticker] = metrics
     return fundamental_data
 
-def calculate_fundamental_factors(data, tickers, fundamental_data):
-    """Calculates fundamental factors for a list of tickers."""
-    data_fundamental = data.copy()
-    for ticker in tickers:
-        if ticker in fundamental_data:
-            data_fundamental[f'EBIT/EV_{ticker}'] = fundamental_data[ticker]['EBIT'] / fundamental_data[ticker]['EV']
-            data_fundamental[f'Price/Sales_{ticker}'] = fundamental_data[ticker]['Price/Sales']
-            data_fundamental[f'ROE_{ticker}'] = fundamental_data[ticker]['ROE']
-            data_fundamental[f'ROIC_{ticker}'] = fundamental_data[ticker]['ROIC']
-            data_fundamental[f'Gross Profitability_{ticker}'] = fundamental_data[ticker]['Gross Profitability']
-    return data_fundamental
-
-def calculate_technical_factors(data, tickers):
-    """Calculates technical factors for a list of tickers."""
-    data_technical = pd.DataFrame(index=data.index)
-    for ticker in tickers:
-        if ticker in data:
-            data_technical[f'Momentum_6m_{ticker}'] = data[ticker]['Adj Close'].pct_change(126)  # 6 months momentum
-            data_technical[f'Momentum_12m_{ticker}'] = data[ticker]['Adj Close'].pct_change(252)  # 12 months momentum
-            data_technical[f'Volatility_{ticker}'] = data[ticker]['Adj Close'].rolling(window=252).std()  # 1 year rolling volatility
-            data_technical[f'SMA_{ticker}'] = data[ticker]['Adj Close'].rolling(window=200).mean()  # 200-day simple moving average
-    return data_technical
-
-class QuantamentalsStrategy(bt.Strategy):
-    params = (('rebalance_period', 30),)
-
-    def __init__(self):
-        self.rebalance_counter = 0
-        self.data_close = {ticker: self.datas[i].close for i, ticker in enumerate(self.datas)}
-        
-        # Adding SMA indicator for SPY
-        self.spy_sma = bt.indicators.SimpleMovingAverage(self.datas[0].close, period=100)
-
-        # Track portfolio value and cash
-        self.portfolio_value = []
-        self.cash = []
-
-    def next(self):
-        if self.rebalance_counter % self.params.rebalance_period == 0:
-            self.rebalance_portfolio()
-        self.rebalance_counter += 1
-        
-        # Append portfolio value and cash to the lists
-        self.portfolio_value.append(self.broker.getvalue())
-        self.cash.append(self.broker.getcash())
-
-    def rebalance_portfolio(self):
-        scores = {}
-        for data in self.datas:
-            ticker = data._name
-            if f'EBIT/EV_{ticker}' in self.data_close and f'ROIC_{ticker}' in self.data_close and f'Volatility_{ticker}' in self.data_close:
-                ebit_ev = self.data_close[f'EBIT/EV_{ticker}'][0]
-                roic = self.data_close[f'ROIC_{ticker}'][0]
-                vol = self.data_close[f'Volatility_{ticker}'][0]
-
-                if pd.notna(ebit_ev) and pd.notna(roic) and pd.notna(vol):
-                    scores[ticker] = {
-                        'Quality': roic,
-                        'Value': ebit_ev,
-                        'Volatility': vol
-                    }
-
-        # Ranking stocks based on Quality, Value, and Volatility
-        quality_rank = {ticker: rank for rank, ticker in enumerate(sorted(scores, key=lambda x: scores[x]['Quality'], reverse=True), 1)}
-        value_rank = {ticker: rank for rank, ticker in enumerate(sorted(scores, key=lambda x: scores[x]['Value'], reverse=True), 1)}
-        volatility_rank = {ticker: rank for rank, ticker in enumerate(sorted(scores, key=lambda x: scores[x]['Volatility']), 1)}
-
-        # Combining ranks to get a composite score
-        combined_rank = {ticker: quality_rank[ticker] + value_rank[ticker] + volatility_rank[ticker] for ticker in scores}
-
-        # Selecting top decile stocks
-        top_decile_stocks = sorted(combined_rank, key=combined_rank.get)[:50]
-
-        # Filtering top momentum stocks from the top decile stocks
-        momentum_scores = {ticker: self.data_close[f'Momentum_6m_{ticker}'][0] for ticker in top_decile_stocks if pd.notna(self.data_close[f'Momentum_6m_{ticker}'][0])}
-        top_momentum_stocks = sorted(momentum_scores, key=momentum_scores.get, reverse=True)[:20]
-
-        # SPY (or similar market index) price and moving average
-        spy_data = self.datas[0]
-        spy_sma = self.spy_sma[0]
-        spy_price = spy_data.close[0]
-
-        # Rebalancing the portfolio based on the conditions
-        for data in self.datas:
-            ticker = data._name
-            if spy_price > spy_sma and ticker in top_momentum_stocks:
-                self.order_target_percent(data, target=1.0 / len(top_momentum_stocks))
-            else:
-                self.order_target_percent(data, target=0)
-
-    def log_performance(self):
-        print(f"Final Portfolio Value: {self.broker.getvalue()}")
-        print(f"Final Cash Value: {self.broker.getcash()}")
-        print(f"Total Returns: {self.broker.getvalue() / 1000000 - 1:.2%}")
-        print("Trades Executed:")
-        for trade in self._trades:
-            print(trade)
-
-    def stop(self):
-        # Print performance when the strategy ends
-        self.log_performance()
+def build_factor_panel(data, tickers, fundamental_data, cache_dir=None):
+    """
+    Computes every factor once across all tickers as a FactorPanel. With cache_dir, a saved
+    panel built from the same closes and fundamentals is memory-mapped instead, and a new one is saved.
+    """
+    tickers = [ticker for ticker in tickers if ticker in data]
+    closes = pd.DataFrame({ticker: data[ticker]['Adj Close'] for ticker in tickers}, index=data.index)
+    if cache_dir and os.path.exists(os.path.join(cache_dir, 'panel.json')):
+        panel = FactorPanel.load(cache_dir)
+        if panel.matches(closes.index, tickers, TECHNICAL_FACTORS + FUNDAMENTAL_FACTORS,
+                         input_digest(closes, fundamental_data)):
+            logging.info(f"Loaded factor panel from {cache_dir}")
+            return panel
+    panel = FactorPanel.build(closes, fundamental_data)
+    if cache_dir:
+        panel.save(cache_dir)
+    return panel
+
+@functools.lru_cache(maxsize=None)
+def quantamentals_strategy():
+    """
+    The backtrader strategy class. backtrader is imported here, on the first backtrader run, so
+    the vectorized engine and importers of this module's helpers never load it.
+    """
+    import backtrader as bt
+
+    class QuantamentalsStrategy(bt.Strategy):
+        params = (('rebalance_period', 30),)
+
+        def __init__(self):
+            self.rebalance_counter = 0
+            self.data_close = {ticker: self.datas[i].close for i, ticker in enumerate(self.datas)}
+
+            # Adding SMA indicator for SPY
+            self.spy_sma = bt.indicators.SimpleMovingAverage(self.datas[0].close, period=100)
+
+            # Track portfolio value and cash
+            self.portfolio_value = []
+            self.cash = []
+
+        def next(self):
+            if self.rebalance_counter % self.params.rebalance_period == 0:
+                self.rebalance_portfolio()
+            self.rebalance_counter += 1
+
+            # Append portfolio value and cash to the lists
+            self.portfolio_value.append(self.broker.getvalue())
+            self.cash.append(self.broker.getcash())
+
+        def rebalance_portfolio(self):
+            # One row of factor values across the feeds, NaN where a factor line is missing
+            tickers = [data._name for data in self.datas]
+            def factor_row(name):
+                return np.array([[self.data_close[f'{name}_{ticker}'][0] if f'{name}_{ticker}' in self.data_close else np.nan
+                                  for ticker in tickers]], dtype='float64')
+
+            selected = select_portfolio(factor_row('ROIC'), factor_row('EBIT/EV'), factor_row('Volatility'), factor_row('Momentum_6m'))[0]
+            top_momentum_stocks = [ticker for ticker, chosen in zip(tickers, selected) if chosen]
+
+            # SPY (or similar market index) price and moving average
+            spy_data = self.datas[0]
+            spy_sma = self.spy_sma[0]
+            spy_price = spy_data.close[0]
+
+            # Rebalancing the portfolio based on the conditions
+            for data in self.datas:
+                ticker = data._name
+                if spy_price > spy_sma and ticker in top_momentum_stocks:
+                    self.order_target_percent(data, target=1.0 / len(top_momentum_stocks))
+                else:
+                    self.order_target_percent(data, target=0)
+
+        def log_performance(self):
+            print(f"Final Portfolio Value: {self.broker.getvalue()}")
+            print(f"Final Cash Value: {self.broker.getcash()}")
+            print(f"Total Returns: {self.broker.getvalue() / 1000000 - 1:.2%}")
+            print("Trades Executed:")
+            for trade in self._trades:
+                print(trade)
+
+        def stop(self):
+            # Print performance when the strategy ends
+            self.log_performance()
+
+    return QuantamentalsStrategy
+
+def select_portfolio(quality, value, volatility, momentum, top_decile=50, top_momentum=20, factor_weights=None):
+    """
+    Boolean (rows x tickers) mask of the names rebalance_portfolio buys: the top momentum names
+    among the best combined Quality/Value/Volatility ranks. Works on every row at once.
+    """
+    quality, value, volatility, momentum = (np.atleast_2d(np.asarray(x, dtype='float64')) for x in (quality, value, volatility, momentum))
+    eligible = ~np.isnan(quality) & ~np.isnan(value) & ~np.isnan(volatility)
+
+    # Ranking stocks based on Quality, Value, and Volatility
+    combined_rank = composite_score([
+        ordinal_rank(np.where(eligible, quality, np.nan), ascending=False),
+        ordinal_rank(np.where(eligible, value, np.nan), ascending=False),
+        ordinal_rank(np.where(eligible, volatility, np.nan)),
+    ], factor_weights)
+
+    # Selecting top decile stocks
+    top_decile_stocks = top_k_mask(combined_rank, top_decile)
+
+    # Filtering top momentum stocks from the top decile stocks, ties in the combined rank's order
+    momentum_rank = ordinal_rank(np.where(top_decile_stocks, momentum, np.nan), ascending=False,
+                                 tiebreak=ordinal_rank(combined_rank))
+    return momentum_rank <= top_momentum
+
+def quantamentals_weights(quality, value, volatility, momentum, regime, rebalance, top_decile=50, top_momentum=20):
+    """
+    Target weights of QuantamentalsStrategy.rebalance_portfolio as a (dates x tickers) matrix:
+    on rebalance bars in a risk-on regime, equal weights in select_portfolio's names; zero
+    everywhere else. All rebalance dates are screened in one call.
+    """
+    weights = np.zeros(quality.shape)
+    rows = np.flatnonzero(rebalance & regime)
+    selected = select_portfolio(quality.to_numpy()[rows], value.to_numpy()[rows], volatility.to_numpy()[rows],
+                                momentum.to_numpy()[rows], top_decile, top_momentum)
+    counts = selected.sum(axis=1, keepdims=True)
+    weights[rows] = np.divide(selected, counts, out=np.zeros(selected.shape), where=counts > 0)
+    return pd.DataFrame(weights, index=quality.index, columns=quality.columns)
+
+def run_vectorized_backtest(data, panel, spy_close, start_cash, rebalance_period=30, sma_period=100, commission=0.0):
+    """Runs the quantamentals rules on the vectorized engine over a FactorPanel; returns a BacktestResult."""
+    tickers = panel.tickers
+    closes = pd.DataFrame({ticker: data[ticker]['Close'] for ticker in tickers})
+    opens = pd.DataFrame({ticker: data[ticker]['Open'] for ticker in tickers})
+    index = closes.index
+
+    # SPY over its moving average is the risk-on regime
+    spy_close = spy_close.reindex(index).ffill()
+    regime = (spy_close > spy_close.rolling(window=sma_period).mean()).to_numpy()
+
+    # Like the backtrader run, the rebalance counter starts once the moving average exists
+    rebalance = rebalance_mask(len(index), rebalance_period, offset=sma_period - 1)
+    weights = quantamentals_weights(
+        quality=panel.frame('ROIC'),
+        value=panel.frame('EBIT/EV'),
+        volatility=panel.frame('Volatility'),
+        momentum=panel.frame('Momentum_6m'),
+        regime=regime,
+        rebalance=rebalance,
+    )
+    return run_backtest(opens, closes, weights, rebalance, cash=start_cash, commission=commission)
 
 def main():
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Backtest the 2020 quantamentals strategy.')
+    parser.add_argument('--engine', choices=['backtrader', 'vectorized'], default='backtrader',
+                        help='backtrader runs QuantamentalsStrategy bar by bar; vectorized uses common/backtest.py')
+    parser.add_argument('--all-tickers', action='store_true', help='use the whole S&P 500 instead of a 10-name slice')
+    parser.add_argument('--commission', type=float, default=0.0, help='commission as a fraction of traded value')
+    parser.add_argument('--factor-cache', default=None, help='directory to save the factor panel to and memory-map it from')
+    args = parser.parse_args()
+
     # Step 1: Fetch and Prepare Data
-    url = 'https://en.wikipedia.org/wiki/List_of_S%26P_500_companies'
-    table = pd.read_html(url, header=0)[0]
-    tickers = table['Symbol'].tolist()[40:50]
+    tickers = fetch_sp500_tickers()
+    if not args.all_tickers:
+        tickers = tickers[40:50]
 
     print(tickers)
     start_date = '2003-01-01'
@@ -186,27 +241,33 @@ def main():
     fundamental_data = fetch_fundamental_data(tickers, data)
     logging.info("Fundamental data fetched successfully")
 
-    # Step 3: Calculate Fundamental and Technical Factors
-    data_fundamental = calculate_fundamental_factors(data, tickers, fundamental_data)
-    data_technical = calculate_technical_factors(data, tickers)
+    # Step 3: Calculate Fundamental and Technical Factors, once across all tickers
+    panel = build_factor_panel(data, tickers, fundamental_data, cache_dir=args.factor_cache)
 
-    # Step 4: Combine Data
-    combined_data = pd.concat([data_fundamental, data_technical], axis=1)
+    start_cash = 1000000
+    if args.engine == 'vectorized':
+        print("start vectorized backtest")
+        spy_close = default_store().closes('SPY', start=start_date, end=end_date)
+        result = run_vectorized_backtest(data, panel, spy_close, start_cash, commission=args.commission)
+        for key, value in result.summary().items():
+            print(f'{key}: {value}')
+        return
 
     print("start backtest")
-    # Step 5: Backtesting with Backtrader
+    # Step 4: Backtesting with Backtrader, one price feed per ticker
+    import backtrader as bt
     cerebro = bt.Cerebro()
     for ticker in tickers:
-        if ticker in combined_data:
-            ticker_data = combined_data[ticker].dropna()
+        if ticker in data:
+            ticker_data = data[ticker].dropna()
             if not ticker_data.empty:
                 data_feed = bt.feeds.PandasData(dataname=ticker_data[['Open', 'High', 'Low', 'Close', 'Volume']])
                 data_feed._name = ticker
                 cerebro.adddata(data_feed)
 
-    cerebro.addstrategy(QuantamentalsStrategy)
-    start_cash = 1000000
+    cerebro.addstrategy(quantamentals_strategy())
     cerebro.broker.set_cash(start_cash)
+    cerebro.broker.setcommission(commission=args.commission)
     strategies = cerebro.run()
     first_strategy = strategies[0]
 
@@ -0,0 +1,116 @@
+import gzip
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import http_date, parse_http_date_safe
+
+
+class CachedFile:
+    """Raw and gzip-compressed bytes of one file, with the validators derived from them."""
+
+    def __init__(self, body, mtime, mtime_ns, size):
+        self.body = body
+        self.gzip_body = gzip.compress(body, compresslevel=6)
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        # Strong validators differ per representation, so identity and gzip get their own
+        self.etag = f'"{digest}"'
+        self.gzip_etag = f'"{digest}-gz"'
+        self.last_modified = http_date(mtime)
+        self.mtime = int(mtime)
+        self.mtime_ns = mtime_ns
+        self.size = size
+
+    @property
+    def cost(self):
+        return len(self.body) + len(self.gzip_body)
+
+
+class FileResponseCache:
+    """
+    Keeps file bytes in memory keyed by path, reloading a file when its mtime or size changes.
+    Entries are evicted least-recently-used once their total size exceeds max_bytes.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        """Returns the CachedFile for path, or None if the file does not exist."""
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            with self._lock:
+                self._discard(path)
+            return None
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry.mtime_ns == stat.st_mtime_ns and entry.size == stat.st_size:
+                self._entries.move_to_end(path)
+                return entry
+        try:
+            with open(path, 'rb') as handle:
+                # Validators from the opened file itself, so they always describe the bytes read
+                stat = os.fstat(handle.fileno())
+                body = handle.read()
+        except FileNotFoundError:
+            # Removed between the stat and the open, e.g. a pruned generation; callers fall back
+            # to the current file or a 404
+            with self._lock:
+                self._discard(path)
+            return None
+        entry = CachedFile(body, stat.st_mtime, stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            self._discard(path)
+            if entry.cost <= self.max_bytes:
+                self._entries[path] = entry
+                self._total += entry.cost
+                while self._total > self.max_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._total -= evicted.cost
+        return entry
+
+    def _discard(self, path):
+        entry = self._entries.pop(path, None)
+        if entry is not None:
+            self._total -= entry.cost
+
+
+def _etag_matches(header, etag):
+    if header.strip() == '*':
+        return True
+    return etag in (tag.strip().removeprefix('W/') for tag in header.split(','))
+
+
+def cached_response(request, entry, content_type):
+    """
+    Serves a CachedFile with ETag/Last-Modified validators, answering conditional requests with
+    304 and sending the precompressed body to clients that accept gzip.
+    """
+    use_gzip = 'gzip' in request.headers.get('Accept-Encoding', '')
+    etag = entry.gzip_etag if use_gzip else entry.etag
+
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match is not None:
+        not_modified = _etag_matches(if_none_match, etag)
+    else:
+        since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+        not_modified = since is not None and entry.mtime <= since
+
+    if not_modified:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(entry.gzip_body if use_gzip else entry.body, content_type=content_type)
+        if use_gzip:
+            response['Content-Encoding'] = 'gzip'
+    response['ETag'] = etag
+    response['Last-Modified'] = entry.last_modified
+    response['Vary'] = 'Accept-Encoding'
+    # Clients may keep the body but must revalidate, which is a cheap 304 when nothing changed
+    response['Cache-Control'] = 'no-cache'
+    return response
@@ -1,3 +1,457 @@
-from django.test import TestCase
+import gzip
+import importlib.util
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+from django.test import SimpleTestCase, TestCase
+
+from . import views
+from .events import GenerationWatcher
+from .models import Stock
+from .paper_backend.common import incremental, signal_store
+from .paper_backend.common.atomic import atomic_open, atomic_write
+from .paper_backend.common.backtest import rebalance_mask, run_backtest
+from .paper_backend.common.breadth import BreadthPanel, rolling_min
+from .paper_backend.common.materialize import GENERATIONS_DIR, Materializer, generation_path, manifest_path
+from .paper_backend.common.price_store import BAR_COLUMNS, PriceStore
+from .paper_backend.common.series_store import Series, SeriesCache, series_dir, write_series
+from .paper_backend.common.signal_index import SignalIndex
+from .paper_backend.common.signal_store import BUY, MISSING, SELL, load_signals
+from .paper_backend.common.synthetic import SyntheticMarket
+from .paper_backend.common.transitions import find_transitions
+
+
+class MarketStore:
+    """
+    Seeded random-walk closes up to an optional last date, in the price store's interface.
+    partial scales the closes of that last date, as a bar fetched mid-session would be off.
+    """
+
+    tickers = ['SPY', 'XLU', 'SPXL'] + [f'U{number}' for number in range(8)]
+
+    def __init__(self, end=None, partial=1.0, seed=11, n_bars=750):
+        rng = np.random.default_rng(seed)
+        dates = pd.bdate_range('2004-01-02', periods=n_bars)
+        returns = 0.015 * rng.standard_normal((n_bars, len(self.tickers)))
+        self.frame = pd.DataFrame(100 * np.exp(np.cumsum(returns, axis=0)), index=dates, columns=self.tickers)
+        if end is not None:
+            self.frame.loc[end] *= partial
+        self.end = end
+
+    def closes(self, ticker, start='1980-01-01', end=None):
+        return self.frame[ticker].loc[start:self.end].rename('Close')
+
+
+class PriceStoreTests(SimpleTestCase):
+    """The store only fetches what it does not hold, including bars past an earlier explicit end."""
+
+    class Source:
+        def __init__(self):
+            dates = pd.bdate_range('2019-01-01', '2020-12-31')
+            self.bars = pd.DataFrame({column: np.arange(len(dates), dtype='float64') for column in BAR_COLUMNS},
+                                     index=dates)
+            self.calls = []
+
+        def fetch(self, ticker, start, end=None):
+            self.calls.append((pd.Timestamp(start), end))
+            bars = self.bars[self.bars.index >= pd.Timestamp(start)]
+            return bars[bars.index < pd.Timestamp(end)] if end is not None else bars
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def test_open_end_after_an_explicit_end(self):
+        source = self.Source()
+        store = PriceStore(self.directory, source)
+        self.assertEqual(store.closes('AAA', '2019-01-01', '2019-09-30').index[-1], pd.Timestamp('2019-09-27'))
+        # Fresh by age, but only fetched up to 2019-09-30
+        self.assertEqual(store.closes('AAA', '2019-01-01').index[-1], pd.Timestamp('2020-12-31'))
+        self.assertEqual(source.calls[-1], (pd.Timestamp('2019-09-27'), None))
+        # The tail is now held, and a new store reads it from disk without fetching
+        reloaded = PriceStore(self.directory, source)
+        self.assertEqual(reloaded.closes('AAA', '2019-01-01').index[-1], pd.Timestamp('2020-12-31'))
+        self.assertEqual(len(source.calls), 2)
+
+
+class IncrementalTests(SimpleTestCase):
+    """A run split across days writes the same signals as one replay of the whole history."""
+
+    def setUp(self):
+        # Mid-week, so the relative strength states carry a partial week across the two runs
+        self.cut = MarketStore().frame.index[377].strftime('%Y-%m-%d')
+        universe = [ticker for ticker in MarketStore.tickers if ticker.startswith('U')]
+        ripple = (incremental.RippleState, lambda: incremental.RippleState(universe, window=60, climax=0.3))
+        patcher = mock.patch.dict(incremental.STRATEGIES, {'2024_lows': ripple})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_in(self, directory, *runs):
+        state_dir = os.path.join(directory, 'state')
+        with mock.patch.object(incremental, 'STATE_DIR', state_dir), \
+                mock.patch.object(signal_store, 'BUY_SELL_DIR', directory):
+            for store, rebuild in runs:
+                incremental.update_strategy(self.name, store=store, rebuild=rebuild)
+        return load_signals(os.path.join(directory, f'{self.name}.json'))
+
+    def test_update_matches_rebuild(self):
+        for name in incremental.STRATEGIES:
+            with self.subTest(name=name), tempfile.TemporaryDirectory() as split, tempfile.TemporaryDirectory() as full:
+                self.name = name
+                updated = self.run_in(split, (MarketStore(end=self.cut), False), (MarketStore(), False))
+                rebuilt = self.run_in(full, (MarketStore(), True))
+                self.assertGreater(len(rebuilt), 0)
+                self.assertEqual(updated, rebuilt)
+
+    def test_partial_last_bar_is_not_kept(self):
+        for name in incremental.STRATEGIES:
+            with self.subTest(name=name), tempfile.TemporaryDirectory() as split, tempfile.TemporaryDirectory() as full:
+                self.name = name
+                # The first run sees the cut day mid-session, 20% below where it closes
+                updated = self.run_in(split, (MarketStore(end=self.cut, partial=0.8), False), (MarketStore(), False))
+                rebuilt = self.run_in(full, (MarketStore(), True))
+                self.assertEqual(updated, rebuilt)
+
+    def test_append_skips_dates_already_written(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'signals.json')
+            signal_store.write_signals(path, {'2020-01-02': 'Buy', '2020-01-03': 'Sell'})
+            signal_store.append_signals(path, [('2020-01-02', 'Buy'), ('2020-01-03', 'Buy'), ('2020-01-06', 'Sell')])
+            signal_store.append_signals(path, [('2020-01-06', 'Buy')])
+            with open(path) as json_file:
+                pairs = json.load(json_file, object_pairs_hook=list)
+        self.assertEqual(pairs, [('2020-01-02', 'Buy'), ('2020-01-03', 'Sell'), ('2020-01-06', 'Sell')])
+
+
+class BreadthTests(SimpleTestCase):
+    """The block rolling minimum and the breadth panel against per-ticker pandas rolling."""
+
+    def test_rolling_min_matches_pandas(self):
+        rng = np.random.default_rng(0)
+        values = rng.random((300, 7))
+        values[rng.random(values.shape) < 0.1] = np.inf
+        for window in (1, 2, 5, 63, 252, 400):
+            with self.subTest(window=window):
+                # pandas reports a window of nothing but +inf as NaN
+                expected = np.nan_to_num(pd.DataFrame(values).rolling(window, min_periods=1).min().to_numpy(), nan=np.inf)
+                np.testing.assert_array_equal(rolling_min(values, window), expected)
+
+    def test_low_percentage_matches_pandas(self):
+        rng = np.random.default_rng(1)
+        dates = pd.bdate_range('2020-01-01', periods=400)
+        series = {}
+        for number in range(12):
+            close = pd.Series(100 * np.exp(np.cumsum(0.02 * rng.standard_normal(len(dates)))), index=dates)
+            # Late listings and missing bars, so each ticker's window counts its own bars
+            series[f'T{number}'] = close.iloc[int(rng.integers(0, 150)):].sample(frac=0.9, random_state=number).sort_index()
+        panel = BreadthPanel.from_series(series)
+
+        for window in (20, 252):
+            with self.subTest(window=window):
+                lows = pd.DataFrame({ticker: close == close.rolling(window, min_periods=1).min()
+                                     for ticker, close in series.items()})
+                traded = pd.DataFrame({ticker: close.notna() for ticker, close in series.items()})
+                expected = (lows.sum(axis=1) / traded.sum(axis=1)).reindex(panel.dates)
+                np.testing.assert_allclose(panel.low_percentage(window).to_numpy(), expected.to_numpy(dtype='float64'))
+
+
+class SignalIndexTests(SimpleTestCase):
+    """As-of lookups over one signal series."""
+
+    def setUp(self):
+        # Out of order on purpose: the index sorts its dates
+        self.index = SignalIndex.from_dict({'2020-01-08': 'Buy', '2020-01-02': 'Buy', '2020-01-06': 'Sell'})
+
+    def test_asof(self):
+        self.assertEqual(self.index.asof('2020-01-01'), (None, None))
+        self.assertEqual(self.index.asof('2020-01-02'), ('2020-01-02', 'Buy'))
+        self.assertEqual(self.index.asof('2020-01-05'), ('2020-01-02', 'Buy'))
+        self.assertEqual(self.index.asof('2020-01-07 15:30:00'), ('2020-01-06', 'Sell'))
+        self.assertEqual(self.index.asof(pd.Timestamp('2021-01-01')), ('2020-01-08', 'Buy'))
+
+    def test_asof_many_matches_asof(self):
+        dates = np.arange(np.datetime64('2019-12-30'), np.datetime64('2020-01-12'))
+        expected = [{None: MISSING, 'Buy': BUY, 'Sell': SELL}[self.index.asof(date)[1]] for date in dates]
+        np.testing.assert_array_equal(self.index.asof_many(dates), expected)
+
+    def test_range_is_inclusive(self):
+        dates, codes = self.index.range('2020-01-02', '2020-01-06')
+        self.assertEqual([str(date) for date in dates], ['2020-01-02', '2020-01-06'])
+        np.testing.assert_array_equal(codes, [BUY, SELL])
+        self.assertEqual(len(self.index.range(start='2020-01-07')[0]), 1)
+
+
+class PlotlyViewTests(SimpleTestCase):
+    """ETag and Last-Modified revalidation and the precompressed gzip body of the plotly view."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        dates = pd.bdate_range('2020-06-01', '2021-06-01')
+        payload = {'date': dates.strftime('%Y-%m-%d').tolist(), 'close': np.linspace(100, 200, len(dates)).tolist()}
+        with open(os.path.join(directory.name, 'p2_1_Year_plotly.json'), 'w') as json_file:
+            json.dump(payload, json_file, indent=4)
+        patcher = mock.patch.object(views, 'PLOTLY_DATA_DIR', directory.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.url = '/stocks/data/p2/1_Year/'
+
+    def test_conditional_requests(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        etag = response['ETag']
+
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH='"other"').status_code, 200)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+        not_modified = self.client.get(self.url, HTTP_IF_NONE_MATCH=f'W/{etag}')
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.content, b'')
+
+    def test_gzip(self):
+        plain = self.client.get(self.url)
+        compressed = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', compressed['Vary'])
+        self.assertEqual(gzip.decompress(compressed.content), plain.content)
+        # Each representation has its own validator
+        self.assertNotEqual(compressed['ETag'], plain['ETag'])
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=compressed['ETag']).status_code, 200)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=compressed['ETag'],
+                                         HTTP_ACCEPT_ENCODING='gzip').status_code, 304)
+
+    def test_missing_file(self):
+        self.assertEqual(self.client.get('/stocks/data/p2/9_Years/').status_code, 404)
+
+
+class MaterializerTests(SimpleTestCase):
+    """Generations are swapped in through the manifest and old ones are pruned."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.base_dir = directory.name
+        dates = pd.bdate_range('2019-01-01', '2021-06-01')
+        self.frame = pd.DataFrame({'Close': np.linspace(100, 200, len(dates))}, index=dates)
+        self.now = datetime(2021, 6, 1, 18)
+
+    def write(self, minutes, scale=1.0, keep_generations=3):
+        frame = self.frame * scale
+        return Materializer('p1', self.base_dir, now=self.now + timedelta(minutes=minutes),
+                            keep_generations=keep_generations).write(frame, {'close': 'Close'}, [('2021-05-03', 'Buy')])
+
+    def test_manifest_points_at_the_new_generation(self):
+        first = self.write(0)
+        second = self.write(1, scale=2.0)
+        self.assertNotEqual(first['generation'], second['generation'])
+        with open(manifest_path(self.base_dir, 'p1')) as json_file:
+            self.assertEqual(json.load(json_file)['generation'], second['generation'])
+
+        path = generation_path(self.base_dir, 'p1', 'p1_1_Year_plotly.json')
+        self.assertIn(second['generation'], path)
+        with open(path) as current, open(os.path.join(self.base_dir, 'p1_1_Year_plotly.json')) as alias:
+            payload = json.load(current)
+            self.assertEqual(payload, json.load(alias))
+        self.assertEqual(payload['close'][-1], 400.0)
+        self.assertEqual(payload['date'][-1], '2021-06-01')
+
+    def test_old_generations_are_pruned(self):
+        manifests = [self.write(minutes) for minutes in range(5)]
+        kept = sorted(os.listdir(os.path.join(self.base_dir, GENERATIONS_DIR, 'p1')))
+        self.assertEqual(kept, [manifest['generation'] for manifest in manifests[-3:]])
+
+
+class AtomicWriteTests(SimpleTestCase):
+    """Overlapping writers each get their own temp file and a failed write leaves the old file."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'p1.json')
+
+    def test_overlapping_writers(self):
+        with atomic_open(self.path) as first, atomic_open(self.path) as second:
+            self.assertNotEqual(first.name, second.name)
+            first.write('first')
+            second.write('second')
+        # The outer block finishes last, so its complete file wins
+        with open(self.path) as handle:
+            self.assertEqual(handle.read(), 'first')
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), ['p1.json'])
+
+    def test_failed_write_keeps_the_old_file(self):
+        atomic_write(self.path, 'old')
+        with self.assertRaises(RuntimeError), atomic_open(self.path) as handle:
+            handle.write('partial')
+            raise RuntimeError('writer failed')
+        with open(self.path) as handle:
+            self.assertEqual(handle.read(), 'old')
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), ['p1.json'])
+
+
+class SeriesRangeViewTests(TestCase):
+    """The range view serves the same windows from the series files and from the Stock table."""
+
+    name = 'testrange'
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        patcher = mock.patch.dict(os.environ, {'PAPERS_SERIES_DIR': directory.name})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        rng = np.random.default_rng(2)
+        self.dates = pd.bdate_range('2015-01-01', periods=1500).values.astype('datetime64[D]')
+        self.closes = 100 * np.exp(np.cumsum(0.01 * rng.standard_normal(len(self.dates))))
+        self.codes = np.where(np.cumsum(rng.random(len(self.dates)) < 0.02) % 2 == 0, BUY, SELL).astype(np.int8)
+        points = find_transitions(self.dates, self.codes).points()
+        write_series(self.name, self.dates, {'close': self.closes}, points, signals=self.codes)
+
+    def get(self, **params):
+        response = self.client.get(f'/stocks/data/{self.name}/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_window_from_files(self):
+        payload = self.get(start='2017-03-01', end='2018-12-31', max_points=100)
+        dates, columns, points, total = Series.load(series_dir(self.name)).window('2017-03-01', '2018-12-31', 100)
+        self.assertEqual(payload['date'], [str(day) for day in dates])
+        self.assertEqual(payload['close'], columns['close'].tolist())
+        self.assertEqual(payload['inflection_points'], points)
+        self.assertEqual(payload['total_points'], total)
+        self.assertLessEqual(len(payload['date']), 100 + len(points))
+        self.assertTrue(all('2017-03-01' <= point['date'] <= '2018-12-31' for point in points))
+
+    def test_table_matches_files(self):
+        requests = [{}, {'start': '2017-03-01', 'end': '2018-12-31', 'max_points': 100}, {'start': '2020-06-01'}]
+        from_files = [self.get(**params) for params in requests]
+        Stock.objects.upsert(self.name, self.dates, self.closes, self.codes)
+        self.assertTrue(Stock.objects.series(self.name).exists())
+        for params, expected in zip(requests, from_files):
+            with self.subTest(**params):
+                self.assertEqual(self.get(**params), expected)
+
+    def test_bad_requests(self):
+        self.assertEqual(self.client.get(f'/stocks/data/{self.name}/', {'start': 'yesterday'}).status_code, 400)
+        self.assertEqual(self.client.get('/stocks/data/nosuchseries/').status_code, 404)
+
+
+class GenerationStreamTests(SimpleTestCase):
+    """Under WSGI the event stream is a plain generator that starts at once and ends on its own."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        dates = pd.bdate_range('2021-01-01', '2021-06-01')
+        frame = pd.DataFrame({'Close': np.linspace(100, 200, len(dates))}, index=dates)
+        self.manifest = Materializer('p3', directory.name, now=datetime(2021, 6, 1, 18)).write(frame, {'close': 'Close'}, [])
+        watcher = GenerationWatcher(directory.name, SeriesCache(directory.name), interval=0.01)
+        for name, value in (('generation_watcher', watcher), ('WSGI_STREAM_SECONDS', 0.05)):
+            patcher = mock.patch.object(views, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_stream_ends_after_its_lifetime(self):
+        response = self.client.get('/stocks/events/')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        frames = b''.join(response.streaming_content).decode().split('\n\n')
+        self.assertEqual(frames[0], f'retry: {views.RECONNECT_MS}')
+        self.assertIn(f"id: p3:{self.manifest['generation']}", frames[1])
+        # One event per generation, however many times the watcher polled
+        self.assertEqual(frames[2:], [''])
+
+
+class SyntheticMarketTests(SimpleTestCase):
+    """Seeded synthetic markets are reproducible."""
+
+    def test_same_seed_same_market(self):
+        first = SyntheticMarket(n_tickers=20, years=2, seed=5)
+        second = SyntheticMarket(n_tickers=20, years=2, seed=5)
+        np.testing.assert_array_equal(first.closes, second.closes)
+        np.testing.assert_array_equal(first.regimes, second.regimes)
+        pd.testing.assert_frame_equal(first.bars('T0007'), second.bars('T0007'))
+        # Per-ticker draws, so a subset gets the same fundamentals as the whole universe
+        self.assertEqual(first.fundamentals(['T0007'])['T0007'], second.fundamentals()['T0007'])
+
+    def test_bars_do_not_depend_on_what_else_is_drawn(self):
+        market = SyntheticMarket(n_tickers=20, years=2, seed=5)
+        pd.testing.assert_frame_equal(market.bar_dict(['SPY', 'T0003'])['T0003'], market.bar_dict()['T0003'])
+
+    def test_different_seed_different_market(self):
+        self.assertFalse(np.array_equal(SyntheticMarket(n_tickers=5, years=1, seed=1).closes,
+                                        SyntheticMarket(n_tickers=5, years=1, seed=2).closes))
+
+
+def price_fixture(n_bars=250, tickers=('AAA', 'BBB', 'CCC', 'DDD'), seed=1):
+    """Deterministic random-walk closes, opens gapped off the previous close, and a date index."""
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range('2020-01-01', periods=n_bars)
+    closes = pd.DataFrame(100 * np.exp(np.cumsum(0.02 * rng.standard_normal((n_bars, len(tickers))), axis=0)),
+                          index=dates, columns=list(tickers))
+    opens = closes.shift(1).fillna(closes.iloc[0]) * np.exp(0.01 * rng.standard_normal(closes.shape))
+    return opens, closes, rng
+
+
+@unittest.skipUnless(importlib.util.find_spec('backtrader'), 'backtrader is not installed')
+class BacktestParityTests(SimpleTestCase):
+    """The vectorized engine against backtrader's broker driven with order_target_percent."""
+
+    def backtrader_run(self, opens, closes, weights, rebalance, cash, commission):
+        import backtrader as bt
+
+        class Targets(bt.Strategy):
+            def __init__(self):
+                self.bar = 0
+                self.values = []
+                self.cash = []
+
+            def next(self):
+                if rebalance[self.bar]:
+                    for data in self.datas:
+                        self.order_target_percent(data, target=weights.iloc[self.bar][data._name])
+                self.bar += 1
+                self.values.append(self.broker.getvalue())
+                self.cash.append(self.broker.getcash())
+
+        cerebro = bt.Cerebro()
+        for ticker in closes.columns:
+            frame = pd.DataFrame({
+                'open': opens[ticker],
+                'high': np.maximum(opens[ticker], closes[ticker]),
+                'low': np.minimum(opens[ticker], closes[ticker]),
+                'close': closes[ticker],
+                'volume': 1e6,
+            })
+            cerebro.adddata(bt.feeds.PandasData(dataname=frame), name=ticker)
+        cerebro.addstrategy(Targets)
+        cerebro.broker.set_cash(cash)
+        cerebro.broker.setcommission(commission=commission)
+        strategy = cerebro.run()[0]
+        return np.array(strategy.values), np.array(strategy.cash)
+
+    def test_equity_and_cash_match(self):
+        # Fully invested and over-invested weights make the broker reject orders too
+        for seed, scale in [(1, 0.9), (2, 1.0), (3, 1.05)]:
+            with self.subTest(seed=seed, scale=scale):
+                opens, closes, rng = price_fixture(seed=seed)
+                raw = rng.random(closes.shape)
+                raw[raw < 0.4] = 0
+                weights = pd.DataFrame(raw / raw.sum(axis=1, keepdims=True).clip(min=1e-9) * scale,
+                                       index=closes.index, columns=closes.columns)
+                rebalance = rebalance_mask(len(closes), 7, offset=3)
+
+                result = run_backtest(opens, closes, weights, rebalance, cash=1e6, commission=0.002)
+                values, cash = self.backtrader_run(opens, closes, weights, rebalance, 1e6, 0.002)
+
+                self.assertGreater(len(result.trades), 0)
+                np.testing.assert_allclose(result.equity.to_numpy(), values, rtol=0, atol=1e-6)
+                np.testing.assert_allclose(result.cash.to_numpy(), cash, rtol=0, atol=1e-6)
@@ -6,5 +6,10 @@ urlpatterns = [
     path('index/', views.landing, name='index'),  # Ensures index page can be accessed
     path('render_paper/', views.render_paper, name='render_paper'),
     path('show_image/', views.show_image, name='show_image'),
+    path('data/<str:strategy>/', views.get_series_range, name='get_series_range'),
     path('data/<str:year>/<str:timeframe>/', views.get_plotly_data, name='get_plotly_data'),
+    path('analytics/', views.get_analytics, name='get_analytics'),
+    path('events/', views.stream_generations, name='stream_generations'),
+    path('metrics/', views.get_metrics, name='get_metrics'),
+    path('signals/<str:date>/', views.get_signals_asof, name='get_signals_asof'),
 ]
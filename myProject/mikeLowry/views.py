@@ -1,8 +1,37 @@
 from django.shortcuts import render
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+import asyncio
 import os
-import json
+import time
+from datetime import date as Date
 from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import DatabaseError
+from django.utils.cache import patch_vary_headers
+from asgiref.sync import sync_to_async
+from .events import GenerationWatcher, format_event
+from .models import Stock
+from .paper_backend.common.analytics import ANALYTICS_FILE
+from .paper_backend.common.instrument import load_latest_report, prometheus_text, report_text
+from .paper_backend.common.materialize import generation_path
+from .paper_backend.common.payload import COMPACT_MEDIA_TYPE, compact_path, compact_payload
+from .paper_backend.common.series_store import SeriesCache
+from .paper_backend.common.signal_index import current_book
+from .response_cache import FileResponseCache, cached_response
+
+PLOTLY_DATA_DIR = settings.STATICFILES_DIRS[0]
+plotly_cache = FileResponseCache(getattr(settings, 'PLOTLY_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+series_cache = SeriesCache()
+generation_watcher = GenerationWatcher(PLOTLY_DATA_DIR, series_cache, getattr(settings, 'GENERATION_POLL_SECONDS', 1.0))
+HEARTBEAT_SECONDS = 15
+# Under WSGI each stream holds a worker thread, so it ends after this long and the browser reconnects
+WSGI_STREAM_SECONDS = getattr(settings, 'GENERATION_STREAM_SECONDS', 300)
+RECONNECT_MS = 1000
+DEFAULT_MAX_POINTS = 2000
+MAX_POINTS_LIMIT = 20000
+METRICS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# The metrics endpoint is for a local scraper only
+METRICS_ALLOWED_IPS = getattr(settings, 'METRICS_ALLOWED_IPS', ('127.0.0.1', '::1'))
 
 def landing(request):
     return render(request, 'index.html')
@@ -13,16 +42,149 @@ def render_paper(request):
 def show_image(request):
     return render(request, 'graph.html')
 
-def get_plotly_data(request, year, timeframe):
-    # Update this path to where your static files are located
-    json_file_path = os.path.join(settings.BASE_DIR, 'static', f'{year}_{timeframe}_plotly.json')
-    
-    # Print the file path to debug
-    print(f"Checking file path: {json_file_path}")
-    
-    if os.path.exists(json_file_path):
-        with open(json_file_path, 'r') as json_file:
-            data = json.load(json_file)
-        return JsonResponse(data)
-    else:
+def plotly_entry(prefix, filename):
+    # The current generation's copy is never rewritten in place; the stable name is the fallback
+    # for files published before generations existed or pruned under a slow reader
+    for path in (generation_path(PLOTLY_DATA_DIR, prefix, filename), os.path.join(PLOTLY_DATA_DIR, filename)):
+        entry = plotly_cache.get(path) if path else None
+        if entry is not None:
+            return entry
+    return None
+
+async def get_plotly_data(request, year, timeframe):
+    # The papers write their plotly files into the app's static directory
+    filename = f'{year}_{timeframe}_plotly.json'
+
+    # Clients that accept the compact typed-array format get it when the papers have written one
+    entry = None
+    content_type = 'application/json'
+    if COMPACT_MEDIA_TYPE in request.headers.get('Accept', ''):
+        entry = await asyncio.to_thread(plotly_entry, year, compact_path(filename))
+        content_type = COMPACT_MEDIA_TYPE
+
+    # Serve the file's bytes from memory instead of parsing and re-serializing it per request; a
+    # stat (and a read after a new generation) runs in a worker thread, off the event loop
+    if entry is None:
+        entry = await asyncio.to_thread(plotly_entry, year, filename)
+        content_type = 'application/json'
+    if entry is None:
         return JsonResponse({'error': 'File not found'}, status=404)
+    response = cached_response(request, entry, content_type)
+    patch_vary_headers(response, ['Accept'])
+    return response
+
+def _series_window(strategy, start, end, max_points):
+    # Blocking half of get_series_range: the ORM range query or the memory-mapped series file
+    try:
+        series = Stock.objects.window(strategy, start, end) if Stock.objects.series(strategy).exists() else None
+    except DatabaseError:
+        # A database without the series columns (not migrated yet) serves from the files too
+        series = None
+    if series is None:
+        try:
+            series = series_cache.get(strategy)
+        except ValueError:
+            series = None
+    return None if series is None else series.window(start, end, max_points)
+
+async def get_series_range(request, strategy):
+    # Any date window of a strategy's full history, downsampled to a point budget
+    try:
+        start = Date.fromisoformat(request.GET['start']) if request.GET.get('start') else None
+        end = Date.fromisoformat(request.GET['end']) if request.GET.get('end') else None
+        max_points = int(request.GET.get('max_points', DEFAULT_MAX_POINTS))
+    except ValueError:
+        return JsonResponse({'error': 'Invalid start, end or max_points'}, status=400)
+    max_points = min(max(max_points, 3), MAX_POINTS_LIMIT)
+
+    # Ingested series are read with one indexed range query; the series files are the fallback
+    window = await sync_to_async(_series_window)(strategy, start, end, max_points)
+    if window is None:
+        return JsonResponse({'error': 'Series not found'}, status=404)
+    dates, columns, inflection_points, total_points = window
+
+    if COMPACT_MEDIA_TYPE in request.headers.get('Accept', ''):
+        payload = compact_payload(dates, columns, [(point['date'], point['signal']) for point in inflection_points])
+        content_type = COMPACT_MEDIA_TYPE
+    else:
+        payload = {'date': [str(day) for day in dates], 'inflection_points': inflection_points}
+        # NaN is not valid JSON, so gaps go out as null
+        payload.update({key: [None if value != value else value for value in values.tolist()]
+                        for key, values in columns.items()})
+        content_type = 'application/json'
+    payload['total_points'] = total_points
+    response = JsonResponse(payload, content_type=content_type)
+    patch_vary_headers(response, ['Accept'])
+    return response
+
+async def get_analytics(request):
+    # Per-timeframe metrics of every strategy and the consensus, written by the nightly run
+    entry = await asyncio.to_thread(plotly_cache.get, os.path.join(PLOTLY_DATA_DIR, ANALYTICS_FILE))
+    if entry is None:
+        return JsonResponse({'error': 'Analytics not found'}, status=404)
+    return cached_response(request, entry, 'application/json')
+
+async def get_signals_asof(request, date):
+    # What every strategy in buy_sell_dicts was saying on the given YYYY-MM-DD date
+    try:
+        query_date = Date.fromisoformat(date)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid date, expected YYYY-MM-DD'}, status=400)
+    snapshot = await asyncio.to_thread(lambda: current_book().snapshot(query_date))
+    return JsonResponse({'date': query_date.isoformat(), 'signals': snapshot})
+
+def polled_events(seconds):
+    # WSGI servers cannot stream an async iterator (Django collects it whole first), so this
+    # plain generator polls the watcher itself and returns after seconds
+    yield f'retry: {RECONNECT_MS}\n\n'
+    deadline = time.monotonic() + seconds
+    sent = {}
+    last_frame = time.monotonic()
+    while True:
+        generation_watcher.poll()
+        for prefix, event in generation_watcher.latest.items():
+            if sent.get(prefix) != event['generation']:
+                sent[prefix] = event['generation']
+                last_frame = time.monotonic()
+                yield format_event(event)
+        now = time.monotonic()
+        if now >= deadline:
+            return
+        if now - last_frame >= HEARTBEAT_SECONDS:
+            last_frame = now
+            yield ': keep-alive\n\n'
+        time.sleep(min(generation_watcher.interval, deadline - now))
+
+async def stream_generations(request):
+    # Server-sent events: the current generation of every prefix, then one event per publish
+    async def events():
+        queue = await generation_watcher.subscribe()
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    # Comment frames keep proxies from closing an idle stream
+                    yield ': keep-alive\n\n'
+                    continue
+                yield format_event(event)
+        finally:
+            generation_watcher.unsubscribe(queue)
+
+    stream = events() if isinstance(request, ASGIRequest) else polled_events(WSGI_STREAM_SECONDS)
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+async def get_metrics(request):
+    # View latency histograms of this process, then the stage timings of the last pipeline run
+    if request.META.get('REMOTE_ADDR') not in METRICS_ALLOWED_IPS:
+        return JsonResponse({'error': 'Forbidden'}, status=403)
+    report = await asyncio.to_thread(load_latest_report)
+    text = prometheus_text()
+    if report is not None:
+        text += report_text(report)
+    response = HttpResponse(text, content_type=METRICS_CONTENT_TYPE)
+    response['Cache-Control'] = 'no-cache'
+    return response
@@ -41,6 +41,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Outermost, so the latency histograms cover every other middleware too
+    'mikeLowry.middleware.view_latency_middleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -130,6 +132,12 @@ STATICFILES_DIRS = [
     BASE_DIR / "mikeLowry/static",
 ]
 
+# Memory budget for the in-process cache behind the /stocks/data/ endpoints
+PLOTLY_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Client addresses allowed to scrape /stocks/metrics/
+METRICS_ALLOWED_IPS = ('127.0.0.1', '::1')
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 